@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+"""
+benchmark.py
+
+Measures the throughput of the silence remover, the concatenator and the video cropper on
+synthetic fixtures, so regressions show up as numbers instead of a feeling that renders got slower.
+
+Fixtures are generated locally with ffmpeg's lavfi sources: testsrc2 video plus a 440 Hz tone that
+switches on and off in a fixed pattern, so every silence has a known length and the amount of
+silence the remover should cut is known exactly. The video and audio streams of the rendered file
+are checked against that. Fixtures are kept in the cache and only built once.
+
+Every stage is timed separately and the results go to a JSON report tagged with the git commit.
+
+Example usage:
+    python benchmark.py --durations 60 300 --resolutions 640x360 1280x720 -o bench.json
+    python benchmark.py --compare bench_before.json -o bench_after.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import cache
+import concatenator
+import probe
+import silence_remover
+import video_cropper
+from workspace import Workspace
+
+# One period of the fixture's audio: (seconds of tone, seconds of silence) pairs, repeated to the end
+SPEECH_PATTERN = [(3.0, 1.0), (2.5, 1.5), (4.0, 0.4), (1.5, 2.0)]
+TONE_FREQUENCY = 440
+
+# Settings the silence remover runs with, chosen so the 0.4 s gaps are too short to be cut
+DB_THRESHOLD = -45
+BUFFER_DURATION = 0.2
+MIN_SILENCE_LENGTH = 0.6
+CHUNK_DURATION = 150
+
+# Allowed difference between each rendered stream's duration and the expected output duration:
+# a fixed allowance for encoder padding plus up to a frame of boundary rounding per silence
+DURATION_TOLERANCE = 0.05
+DURATION_TOLERANCE_PER_SILENCE = 0.01
+
+# Allowed difference between the rendered video and audio durations
+SYNC_TOLERANCE = 0.05
+
+# Number of chapter lines pushed through the timestamp remap
+TIMESTAMP_LINES = 10000
+
+def pattern_silences(duration):
+    """
+    Returns the [start, end] silences of a fixture of the given length, in source time.
+    """
+    silences = []
+    t = 0.0
+    while t < duration:
+        for tone, silence in SPEECH_PATTERN:
+            start = t + tone
+            if start >= duration:
+                return silences
+            silences.append([start, min(start + silence, duration)])
+            t = start + silence
+            if t >= duration:
+                return silences
+    return silences
+
+def expected_removed_duration(duration):
+    """
+    Returns how much the silence remover should cut from a fixture with the benchmark settings.
+    """
+    silences = silence_remover.apply_buffer(
+        [[start, end] for start, end in pattern_silences(duration) if end - start >= MIN_SILENCE_LENGTH],
+        BUFFER_DURATION
+    )
+    return sum(end - start for start, end in silences), len(silences)
+
+def tone_expression():
+    """
+    Builds the aevalsrc expression for the tone pattern, which is on whenever mod(t, period) is in a tone slot.
+    """
+    period = sum(tone + silence for tone, silence in SPEECH_PATTERN)
+    slots = []
+    t = 0.0
+    for tone, silence in SPEECH_PATTERN:
+        slots.append(f"gte(mod(t,{period}),{t})*lt(mod(t,{period}),{t + tone})")
+        t += tone + silence
+    return f"0.5*sin(2*PI*{TONE_FREQUENCY}*t)*({'+'.join(slots)})"
+
+def make_fixture(duration, width, height, fixtures_dir):
+    """
+    Returns the path of the fixture with this duration and resolution, generating it if needed.
+    """
+    path = os.path.join(fixtures_dir, f"fixture_{duration}s_{width}x{height}.mp4")
+    if os.path.exists(path):
+        return path
+
+    print(f"Generating fixture {os.path.basename(path)}")
+    temp_path = f"{path}.tmp.mp4"
+    cmd = [
+        'ffmpeg', '-v', 'error',
+        '-f', 'lavfi', '-i', f"testsrc2=size={width}x{height}:rate=30:duration={duration}",
+        '-f', 'lavfi', '-i', f"aevalsrc='{tone_expression()}':sample_rate=48000:duration={duration}",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-g', '60', '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-b:a', '128k',
+        '-shortest', '-y', temp_path
+    ]
+    subprocess.run(cmd, check=True)
+    os.replace(temp_path, path)
+    return path
+
+def stream_durations(media_file):
+    """
+    Returns (video_duration, audio_duration) of a file's first video and audio streams, None where missing.
+    """
+    durations = []
+    for codec_type in ("video", "audio"):
+        stream = probe.get_stream(media_file, codec_type)
+        durations.append(float(stream["duration"]) if stream and stream.get("duration") not in (None, "N/A") else None)
+    return tuple(durations)
+
+def timed(timings, stage, func, *args, **kwargs):
+    """
+    Calls func and records its wall time in timings[stage]. Returns func's result.
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings[stage] = time.perf_counter() - start
+    return result
+
+def quiet(*args):
+    pass  # passing a progress callback switches the tqdm bars off, which keeps them out of the timings
+
+def benchmark_fixture(fixture, duration, width, height, temp_dir, jobs):
+    """
+    Runs every pipeline stage on one fixture and returns its timings and correctness check.
+    """
+    timings = {}
+
+    silence_intervals, detected_duration = timed(
+        timings, "detect", silence_remover.detect_silence,
+        fixture, DB_THRESHOLD, BUFFER_DURATION, MIN_SILENCE_LENGTH, False
+    )
+
+    chunk_list = timed(timings, "chunk_plan", silence_remover.plan_chunks, detected_duration, CHUNK_DURATION, silence_intervals)
+
+    tasks = []
+    for i, (chunk_start, chunk_end) in enumerate(chunk_list):
+        silence_parts = silence_remover.chunk_silence_parts(silence_intervals, chunk_start, chunk_end)
+        tasks.append((fixture, silence_parts, chunk_end - chunk_start, os.path.join(temp_dir, f"processed_chunk_{i}.mp4"), chunk_start))
+    chunk_removed = timed(timings, "cut", silence_remover.render_chunks, tasks, jobs, quiet)
+
+    output_file = os.path.join(temp_dir, "no_silence.mp4")
+    removed = sum(chunk_removed)
+    timed(
+        timings, "concat", silence_remover.concatenate_chunks,
+        [task[3] for task in tasks if os.path.exists(task[3])], output_file, detected_duration - removed, quiet
+    )
+
+    step = duration / TIMESTAMP_LINES
+    lines = [f"{silence_remover.format_timestamp(i * step)} Chapter {i}\n" for i in range(TIMESTAMP_LINES)]
+    timed(timings, "timestamp_remap", silence_remover.adjust_timestamps, lines, silence_intervals)
+
+    joined_file = os.path.join(temp_dir, "joined.mp4")
+    timed(timings, "concatenator_join", concatenator.concat_demuxer, [fixture, fixture], joined_file)
+
+    crops = [
+        {"name": "left", "x": 0, "y": 0, "width": width // 2, "height": height},
+        {"name": "right", "x": width // 2, "y": 0, "width": width // 2, "height": height},
+    ]
+    # Crops are written next to their input, so crop a link to the fixture inside the workspace
+    crop_input = os.path.join(temp_dir, os.path.basename(fixture))
+    try:
+        os.symlink(fixture, crop_input)
+    except (OSError, NotImplementedError):
+        shutil.copyfile(fixture, crop_input)
+    cropped = timed(timings, "crop", video_cropper.process_crops, crop_input, crops)
+
+    # Judge the render by the file it wrote, so streams that drift apart or lose time show up
+    video_duration, audio_duration = stream_durations(output_file)
+    expected, expected_count = expected_removed_duration(duration)
+    expected_output = duration - expected
+    tolerance = DURATION_TOLERANCE + DURATION_TOLERANCE_PER_SILENCE * expected_count
+    return {
+        "fixture": os.path.basename(fixture),
+        "duration": duration,
+        "resolution": f"{width}x{height}",
+        "jobs": jobs,
+        "chunks": len(chunk_list),
+        "stages": timings,
+        "total": sum(timings.values()),
+        "realtime_factor": duration / sum(timings.values()),
+        "expected_removed": expected,
+        "measured_removed": duration - video_duration if video_duration is not None else None,
+        "video_duration": video_duration,
+        "audio_duration": audio_duration,
+        "removed_ok": video_duration is not None and audio_duration is not None
+                      and abs(video_duration - expected_output) <= tolerance
+                      and abs(audio_duration - expected_output) <= tolerance
+                      and abs(video_duration - audio_duration) <= SYNC_TOLERANCE,
+        "crop_ok": cropped,
+    }
+
+def git_commit():
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def ffmpeg_version():
+    try:
+        result = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True, check=True)
+        return result.stdout.splitlines()[0]
+    except (OSError, subprocess.CalledProcessError, IndexError):
+        return None
+
+def compare_reports(previous, current):
+    """
+    Prints how every stage's time changed between two reports, matching fixtures by name and job count.
+    """
+    previous_runs = {(run["fixture"], run["jobs"]): run for run in previous["runs"]}
+    print(f"\nCompared with {previous.get('commit') or 'unknown commit'}:")
+    for run in current["runs"]:
+        before = previous_runs.get((run["fixture"], run["jobs"]))
+        if before is None:
+            continue
+        print(f"  {run['fixture']} (jobs={run['jobs']})")
+        for stage, seconds in run["stages"].items():
+            if stage in before["stages"] and before["stages"][stage] > 0:
+                change = (seconds / before["stages"][stage] - 1) * 100
+                print(f"    {stage:18s} {before['stages'][stage]:8.3f}s -> {seconds:8.3f}s ({change:+.1f}%)")
+
+def parse_resolution(value):
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid resolution: {value}, expected WIDTHxHEIGHT")
+    return width, height
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the video tools on synthetic fixtures.")
+    parser.add_argument("--durations", type=int, nargs="+", default=[60, 300], help="Fixture lengths in seconds. Default 60 300")
+    parser.add_argument("--resolutions", type=parse_resolution, nargs="+", default=[(640, 360), (1280, 720)], help="Fixture sizes as WIDTHxHEIGHT. Default 640x360 1280x720")
+    parser.add_argument("-j", "--jobs", type=int, nargs="+", default=[1], help="Chunk job counts to benchmark the cut stage with. Default 1")
+    parser.add_argument("-o", "--output", default="benchmark_report.json", help="Path of the JSON report. Default benchmark_report.json")
+    parser.add_argument("--fixtures-dir", help="Where generated fixtures are kept. Defaults to the cache")
+    parser.add_argument("--compare", help="A previous report to compare the stage timings against")
+    args = parser.parse_args()
+
+    fixtures_dir = args.fixtures_dir or cache.cache_dir("benchmark_fixtures")
+    os.makedirs(fixtures_dir, exist_ok=True)
+
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(),
+        "ffmpeg": ffmpeg_version(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {
+            "db_threshold": DB_THRESHOLD,
+            "buffer_duration": BUFFER_DURATION,
+            "min_silence_length": MIN_SILENCE_LENGTH,
+            "chunk_duration": CHUNK_DURATION,
+        },
+        "runs": [],
+    }
+
+    for duration in args.durations:
+        for width, height in args.resolutions:
+            fixture = make_fixture(duration, width, height, fixtures_dir)
+            for jobs in args.jobs:
+                print(f"Benchmarking {os.path.basename(fixture)} with {jobs} job(s)")
+                with Workspace("benchmark", required_bytes=os.path.getsize(fixture) * 4) as temp_dir:
+                    run = benchmark_fixture(fixture, duration, width, height, temp_dir, jobs)
+                report["runs"].append(run)
+                video, audio = (f"{seconds:.2f}s" if seconds is not None else "missing" for seconds in (run["video_duration"], run["audio_duration"]))
+                status = "ok" if run["removed_ok"] else "MISMATCH"
+                print(
+                    f"  output video {video}, audio {audio}, expected {run['duration'] - run['expected_removed']:.2f}s {status}, "
+                    f"{run['realtime_factor']:.1f}x realtime"
+                )
+                for stage, seconds in run["stages"].items():
+                    print(f"    {stage:18s} {seconds:8.3f}s")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare_reports(json.load(f), report)
+
+    if not all(run["removed_ok"] for run in report["runs"]):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
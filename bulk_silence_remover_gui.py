@@ -1,58 +1,83 @@
 import sys
 import os
-import subprocess
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog, QLabel,
-                             QListWidget, QProgressBar, QSpinBox, QDoubleSpinBox, QGroupBox, QFormLayout, QCheckBox)
+                             QListWidget, QProgressBar, QSpinBox, QDoubleSpinBox, QGroupBox, QFormLayout, QCheckBox,
+                             QTableWidget, QTableWidgetItem)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from silence_remover import process_video
 
 class ProcessThread(QThread):
     progress = pyqtSignal(int, str)
-    finished = pyqtSignal()
+    fileStatus = pyqtSignal(int, str, str)  # file row, status, details
+    fileProgress = pyqtSignal(int, int)  # file row, overall percent done
+    finished = pyqtSignal(int, int)  # succeeded, failed
     error = pyqtSignal(str)
 
-    def __init__(self, input_files, timestamp_files, settings):
+    def __init__(self, input_files, timestamp_files, settings, max_parallel=1):
         QThread.__init__(self)
         self.input_files = input_files
         self.timestamp_files = timestamp_files
         self.settings = settings
+        self.max_parallel = max(1, max_parallel)
+
+    def process_file(self, row, input_file, timestamp_file):
+        """
+        Runs silence removal on one file in this process and reports its progress. Returns True on success.
+        Each run creates its own scratch directory, so files never share intermediate chunks.
+        """
+        base, ext = os.path.splitext(input_file)
+        output_file = f"{base}_no_silence{ext}"
+        output_timestamp_file = f"{base}_no_silence_timestamps.txt" if timestamp_file else None
+
+        def on_progress(event):
+            details = f"{event.stage} {event.fraction:.0%}"
+            if event.eta is not None:
+                details += f", {timedelta(seconds=round(event.eta))} left"
+            self.fileProgress.emit(row, int(event.overall * 100))
+            self.fileStatus.emit(row, "Running", details)
+
+        self.fileStatus.emit(row, "Running", "")
+        try:
+            result = process_video(
+                input_file, output_file,
+                self.settings['chunk_duration'],
+                self.settings['db_threshold'],
+                self.settings['buffer_duration'],
+                timestamp_file, output_timestamp_file,
+                min_silence_length=self.settings['min_silence_factor'],
+                progress_callback=on_progress,
+                concurrent_runs=min(self.max_parallel, len(self.input_files))
+            )
+        except Exception as e:
+            self.fileStatus.emit(row, "Failed", str(e))
+            return False
+
+        self.fileProgress.emit(row, 100)
+        self.fileStatus.emit(row, "Done", f"Removed {timedelta(seconds=round(result.removed_duration))}, saved to {result.output_file}")
+        return True
 
     def run(self):
         total_files = len(self.input_files)
-        for i, (input_file, timestamp_file) in enumerate(zip(self.input_files, self.timestamp_files)):
-            try:
-                base, ext = os.path.splitext(input_file)
-                output_file = f"{base}_no_silence{ext}"
-                output_timestamp_file = f"{base}_no_silence_timestamps.txt" if timestamp_file else None
-
-                command = [
-                    'python', 'silence_remover.py',
-                    input_file,
-                    '-o', output_file,
-                    '-d', str(self.settings['db_threshold']),
-                    '-b', str(self.settings['buffer_duration']),
-                    '-c', str(self.settings['chunk_duration']),
-                    '-m', str(self.settings['min_silence_factor'])
-                ]
-
-                if timestamp_file:
-                    command.extend(['-t', timestamp_file])
-                if output_timestamp_file:
-                    command.extend(['--output_timestamps', output_timestamp_file])
-
-                process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1, universal_newlines=True)
-                for line in iter(process.stdout.readline, ''):
-                    self.progress.emit(int((i / total_files) * 100), f"Processing file {i+1}/{total_files}: {line.strip()}")
-                process.stdout.close()
-                return_code = process.wait()
-                if return_code != 0:
-                    self.error.emit(f"Error processing file {input_file}")
-                    return
-
-            except Exception as e:
-                self.error.emit(str(e))
-                return
-
-        self.finished.emit()
+        succeeded = 0
+        failed = 0
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as executor:
+            futures = {
+                executor.submit(self.process_file, i, input_file, timestamp_file): input_file
+                for i, (input_file, timestamp_file) in enumerate(zip(self.input_files, self.timestamp_files))
+            }
+            # A failed file is reported and the rest of the batch keeps going
+            for future in as_completed(futures):
+                if future.result():
+                    succeeded += 1
+                else:
+                    failed += 1
+                    self.error.emit(f"Error processing file {futures[future]}")
+                done = succeeded + failed
+                self.progress.emit(int((done / total_files) * 100), f"Processed {done}/{total_files} files ({failed} failed)")
+
+        self.finished.emit(succeeded, failed)
 
 class BatchSilenceRemoverGUI(QWidget):
     def __init__(self):
@@ -154,7 +179,8 @@ class BatchSilenceRemoverGUI(QWidget):
         settingsLayout.addRow('Buffer Duration (s):', self.bufferDuration)
 
         self.chunkDuration = QSpinBox()
-        self.chunkDuration.setRange(1, 3600)
+        self.chunkDuration.setRange(0, 3600)
+        self.chunkDuration.setSpecialValueText('Auto')  # 0 lets the remover size chunks from free memory
         self.chunkDuration.setValue(150)
         settingsLayout.addRow('Chunk Duration (s):', self.chunkDuration)
 
@@ -164,6 +190,11 @@ class BatchSilenceRemoverGUI(QWidget):
         self.minSilenceFactor.setValue(0.6)
         settingsLayout.addRow('Min Silence Length (s):', self.minSilenceFactor)
 
+        self.parallelFiles = QSpinBox()
+        self.parallelFiles.setRange(1, max(1, os.cpu_count() or 1))
+        self.parallelFiles.setValue(2)
+        settingsLayout.addRow('Files in Parallel:', self.parallelFiles)
+
         settingsGroup.setLayout(settingsLayout)
         layout.addWidget(settingsGroup)
 
@@ -172,6 +203,12 @@ class BatchSilenceRemoverGUI(QWidget):
         self.processButton.clicked.connect(self.processVideos)
         layout.addWidget(self.processButton)
 
+        # Per-file progress
+        self.fileTable = QTableWidget(0, 4)
+        self.fileTable.setHorizontalHeaderLabels(['File', 'Status', 'Progress', 'Output'])
+        self.fileTable.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.fileTable)
+
         # Progress bar
         self.progressBar = QProgressBar()
         layout.addWidget(self.progressBar)
@@ -265,7 +302,7 @@ class BatchSilenceRemoverGUI(QWidget):
         settings = {
             'db_threshold': self.dbThreshold.value(),
             'buffer_duration': self.bufferDuration.value(),
-            'chunk_duration': self.chunkDuration.value(),
+            'chunk_duration': self.chunkDuration.value() or 'auto',
             'min_silence_factor': self.minSilenceFactor.value()
         }
 
@@ -273,8 +310,19 @@ class BatchSilenceRemoverGUI(QWidget):
         self.progressBar.setValue(0)
         self.statusLabel.setText("Processing...")
 
-        self.thread = ProcessThread(input_files, timestamp_files, settings)
+        self.fileTable.setRowCount(0)
+        for row, input_file in enumerate(input_files):
+            self.fileTable.insertRow(row)
+            self.fileTable.setItem(row, 0, QTableWidgetItem(os.path.basename(input_file)))
+            self.fileTable.setItem(row, 1, QTableWidgetItem('Queued'))
+            fileProgressBar = QProgressBar()
+            fileProgressBar.setValue(0)
+            self.fileTable.setCellWidget(row, 2, fileProgressBar)
+
+        self.thread = ProcessThread(input_files, timestamp_files, settings, self.parallelFiles.value())
         self.thread.progress.connect(self.updateProgress)
+        self.thread.fileStatus.connect(self.updateFileStatus)
+        self.thread.fileProgress.connect(self.updateFileProgress)
         self.thread.finished.connect(self.onProcessingFinished)
         self.thread.error.connect(self.onProcessingError)
         self.thread.start()
@@ -283,13 +331,24 @@ class BatchSilenceRemoverGUI(QWidget):
         self.progressBar.setValue(value)
         self.statusLabel.setText(message)
 
-    def onProcessingFinished(self):
-        self.statusLabel.setText("Processing completed successfully!")
+    def updateFileStatus(self, row, status, message):
+        self.fileTable.setItem(row, 1, QTableWidgetItem(status))
+        if message:
+            self.fileTable.setItem(row, 3, QTableWidgetItem(message))
+
+    def updateFileProgress(self, row, value):
+        self.fileTable.cellWidget(row, 2).setValue(value)
+
+    def onProcessingFinished(self, succeeded, failed):
+        if failed:
+            self.statusLabel.setText(f"Processing finished: {succeeded} succeeded, {failed} failed.")
+        else:
+            self.statusLabel.setText("Processing completed successfully!")
         self.processButton.setEnabled(True)
 
     def onProcessingError(self, error_message):
+        # Failures are shown per file; the batch keeps running
         self.statusLabel.setText(f"Error: {error_message}")
-        self.processButton.setEnabled(True)
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
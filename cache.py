@@ -0,0 +1,109 @@
+"""
+cache.py
+
+Small on-disk cache shared by the tools. Every kind of cached data lives in its own
+subdirectory of the cache root, which defaults to ~/.cache/auto-video-editing-suite
+and can be moved with the AVES_CACHE_DIR environment variable.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+
+CACHE_ROOT = os.environ.get(
+    "AVES_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "auto-video-editing-suite")
+)
+
+def cache_dir(name):
+    """
+    Returns the directory for one kind of cached data, creating it if needed.
+    """
+    path = os.path.join(CACHE_ROOT, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def file_key(path):
+    """
+    Builds a cache key from a file's absolute path, size and modification time.
+    Cheap to compute, and changes whenever the file is rewritten.
+    """
+    stat = os.stat(path)
+    identity = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+# Bytes read from each sampled region of a file by content_hash
+HASH_SAMPLE_SIZE = 1024 * 1024
+
+def content_hash(path):
+    """
+    Builds a fast fingerprint of a file's content from its size and three 1 MiB samples taken
+    at the start, middle and end. Unlike file_key it survives copies, renames and touched mtimes,
+    while still costing only a few reads on multi-gigabyte recordings.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, 'rb') as f:
+        for offset in sorted({0, max(0, size // 2 - HASH_SAMPLE_SIZE // 2), max(0, size - HASH_SAMPLE_SIZE)}):
+            f.seek(offset)
+            digest.update(f.read(HASH_SAMPLE_SIZE))
+    return digest.hexdigest()
+
+def params_key(*parts):
+    """
+    Combines a content hash or file key with the parameters that produced a cached result.
+    """
+    return hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+
+def load_json(name, key):
+    """
+    Returns the JSON document stored under key, or None if it is missing or unreadable.
+    A hit refreshes the entry's mtime, which is what evict_lru orders entries by.
+    """
+    path = os.path.join(cache_dir(name), f"{key}.json")
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        os.utime(path)
+        return data
+    except (OSError, ValueError):
+        return None
+
+def save_json(name, key, data, max_bytes=None):
+    """
+    Stores a JSON document under key. The write is atomic so concurrent readers never see a partial file.
+    When max_bytes is given the least recently used entries are evicted to keep the directory under it.
+    """
+    directory = cache_dir(name)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, os.path.join(directory, f"{key}.json"))
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    if max_bytes is not None:
+        evict_lru(name, max_bytes)
+
+def evict_lru(name, max_bytes):
+    """
+    Deletes the least recently used entries of a cache directory until it holds at most max_bytes.
+    """
+    directory = cache_dir(name)
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and not entry.name.endswith(".tmp"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # another process evicted it first
+        total -= size
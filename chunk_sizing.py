@@ -0,0 +1,197 @@
+"""
+chunk_sizing.py
+
+Picks the chunk length for silence_remover's --chunk_duration auto.
+
+Every chunk is rendered by its own ffmpeg process, which seeks to the chunk, runs the select/aselect
+graph and encodes with x264. Most of that process's memory is the frames in flight: decoder
+references, filter queues, x264's lookahead and frame threads. Their size depends on the
+resolution, not on how long the chunk is. The chunk's length only adds the muxer's index, which
+holds one entry per packet until the file is finalised, and the select expression, which has one
+term per kept part. So a worker is modelled as
+
+    worker_bytes = fixed + per_second * chunk_seconds
+
+where fixed comes from the frame size and per_second from the frame rate and the cut density.
+After every render the peak RSS of each chunk's encoder is stored in the cache under the video's
+resolution and frame rate. Once samples exist, they replace the model's estimates.
+
+The chosen length is the longest one that
+- fits one worker per job in the memory budget,
+- still gives every job a few chunks, so no worker sits idle while the last long chunk renders, and
+- keeps the number of kept parts per chunk bounded, since select evaluates the whole expression
+  for every frame.
+"""
+
+import math
+import os
+import subprocess
+
+import numpy as np
+
+import cache
+import probe
+
+# Bounds for the chosen chunk length in seconds. Long chunks lose more work when a run is
+# interrupted and leave the progress bar sitting on one chunk for a long time.
+AUTO_CHUNK_MIN = 30
+AUTO_CHUNK_MAX = 1200
+
+# With several jobs, the source is split into at least this many chunks per job
+AUTO_CHUNKS_PER_JOB = 3
+
+# select evaluates one term per kept part for every frame, this bounds that work per chunk
+MAX_PARTS_PER_CHUNK = 400
+
+# Share of the available memory the chunk encoders may use together, the rest stays free for everything else
+MEMORY_HEADROOM = 0.7
+
+# Assumed available memory when the system can't be asked
+FALLBACK_MEMORY = 4 * 1024 ** 3
+
+# Assumed format when the input can't be probed
+FALLBACK_FORMAT = (1920, 1080, 30.0)
+
+# Memory model for one chunk encoder: the ffmpeg process itself, its frames in flight, and
+# the per-packet index entries and per-part expression terms that grow with the chunk
+WORKER_BASE_BYTES = 100 * 1024 ** 2
+FRAMES_IN_FLIGHT = 64
+BYTES_PER_PACKET = 40
+AUDIO_PACKETS_PER_SECOND = 48000 / 1024
+BYTES_PER_KEPT_PART = 4 * 1024
+
+# Measured peaks are scaled up by this margin before they are trusted for a new run
+MEASURED_MARGIN = 1.2
+
+# Measured (chunk seconds, peak bytes) samples kept per video format
+MEMORY_SAMPLES = 20
+
+def video_format(input_file):
+    """
+    Returns (width, height, fps) of the input's first video stream, or None if it can't be probed.
+    """
+    try:
+        stream = probe.get_stream(input_file, "video")
+        width, height = int(stream["width"]), int(stream["height"])
+        numerator, _, denominator = stream.get("r_frame_rate", "30/1").partition('/')
+        fps = float(numerator) / float(denominator or 1)
+        if fps <= 0:
+            raise ValueError("no frame rate")
+    except (subprocess.CalledProcessError, OSError, TypeError, KeyError, ValueError, ZeroDivisionError):
+        return None
+    return width, height, fps
+
+def available_memory():
+    """
+    Returns how many bytes of memory can be used without pushing other programs into swap.
+    """
+    try:
+        with open("/proc/meminfo", 'r') as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        pass
+    try:
+        # Without a free page count, half of the physical memory is a safe guess
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // 2
+    except (AttributeError, ValueError, OSError):
+        return FALLBACK_MEMORY
+
+def _samples_key(width, height, fps):
+    return cache.params_key("chunk_memory", width, height, round(fps, 2))
+
+def record_chunk_memory(input_file, samples):
+    """
+    Stores the measured peak memory of chunk encoders for the input's video format.
+
+    Args:
+        input_file (str): The video the chunks were cut from.
+        samples (list): (chunk_seconds, peak_bytes) for every rendered chunk.
+    """
+    video = video_format(input_file)
+    # Samples filed under a guessed format would calibrate runs on videos that really have it
+    if not samples or video is None:
+        return
+    key = _samples_key(*video)
+    stored = cache.load_json("chunk_memory", key) or []
+    stored = (stored + [[float(seconds), int(peak)] for seconds, peak in samples])[-MEMORY_SAMPLES:]
+    cache.save_json("chunk_memory", key, stored)
+
+def worker_memory(width, height, fps, cut_density, use_measurements=True):
+    """
+    Estimates the memory of one chunk encoder as (fixed_bytes, bytes_per_second, measured).
+
+    Args:
+        width (int), height (int), fps (float): Format of the input's video stream.
+        cut_density (float): Kept parts per second of source.
+        use_measurements (bool): Whether cached measurements for this format may replace the model.
+
+    Returns:
+        tuple: The fixed cost in bytes, the cost per second of chunk in bytes, and whether the
+               figures come from measured runs rather than the model.
+    """
+    frame_bytes = width * height * 1.5  # yuv420p
+    fixed = WORKER_BASE_BYTES + FRAMES_IN_FLIGHT * frame_bytes
+    per_second = BYTES_PER_PACKET * (fps + AUDIO_PACKETS_PER_SECOND) + BYTES_PER_KEPT_PART * cut_density
+
+    samples = cache.load_json("chunk_memory", _samples_key(width, height, fps)) if use_measurements else None
+    if not samples:
+        return fixed, per_second, False
+
+    seconds = np.array([sample[0] for sample in samples], dtype=float)
+    peaks = np.array([sample[1] for sample in samples], dtype=float) * MEASURED_MARGIN
+    # A slope can only be fitted once chunks of clearly different lengths have been measured
+    if len(samples) >= 2 and seconds.max() >= 1.5 * seconds.min():
+        per_second = max(float(np.polyfit(seconds, peaks, 1)[0]), per_second)
+    # Take the fixed cost from the worst sample, so the estimate covers every measured chunk
+    fixed = float((peaks - per_second * seconds).max())
+    return fixed, per_second, True
+
+def auto_chunk_duration(input_file, silence_intervals, duration, jobs=1, concurrent_runs=1):
+    """
+    Chooses the longest chunk length whose encoders fit in memory with jobs of them running at once.
+
+    Args:
+        input_file (str): Path to the input video file.
+        silence_intervals (list): The silences that will be cut, in source time.
+        duration (float): Duration of the input in seconds.
+        jobs (int): Number of chunks rendered in parallel.
+        concurrent_runs (int): Number of videos being processed at the same time, each with its own
+                               jobs, which all share the available memory.
+
+    Returns:
+        int: Chunk length in seconds.
+    """
+    jobs = max(1, jobs)
+    video = video_format(input_file)
+    width, height, fps = video or FALLBACK_FORMAT
+    if video is None:
+        print(f"Could not probe the video format, sizing chunks for {width}x{height} at {fps:g} fps")
+    cut_density = (len(silence_intervals) + 1) / duration if duration > 0 else 0.0
+    fixed, per_second, measured = worker_memory(width, height, fps, cut_density, video is not None)
+    concurrent_runs = max(1, concurrent_runs)
+    budget = available_memory() * MEMORY_HEADROOM / (jobs * concurrent_runs)
+
+    limits = {"maximum": AUTO_CHUNK_MAX}
+    limits["memory"] = (budget - fixed) / per_second if per_second > 0 else math.inf
+    if jobs > 1:
+        limits["job balance"] = duration / (jobs * AUTO_CHUNKS_PER_JOB)
+    if cut_density > 0:
+        limits["cut density"] = MAX_PARTS_PER_CHUNK / cut_density
+    reason = min(limits, key=limits.get)
+    chunk_duration = int(max(AUTO_CHUNK_MIN, limits[reason]))
+
+    source = "measured" if measured else "estimated"
+    print(
+        f"Auto chunk duration: {chunk_duration}s (limited by {reason}), "
+        f"{source} {(fixed + per_second * chunk_duration) / 1024 ** 2:.0f} MB per job "
+        f"of {budget / 1024 ** 2:.0f} MB available to each of {jobs * concurrent_runs} job(s)"
+    )
+    if fixed + per_second * chunk_duration > budget:
+        print(f"Warning: even {chunk_duration}s chunks may not fit in memory, consider fewer --jobs")
+    return chunk_duration
@@ -3,6 +3,27 @@ import subprocess
 from pathlib import Path
 import tempfile
 import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import cache
+import probe
+import tracing
+from ffmpeg_runner import run_ffmpeg
+from smart_cut import X264_PROFILES
+from timemap import TimeMap, parse_timestamp, format_timestamp
+from workspace import Workspace, check_free_space
+
+# ffprobe spends most of its time waiting on storage, so a few probes can run at once
+PROBE_WORKERS = 8
+
+# Everything that has to match for the concat demuxer to join clips by stream copy
+PROFILE_KEYS = ('v_codec', 'width', 'height', 'frame_rate', 'pix_fmt', 'time_base', 'a_codec', 'sample_rate', 'channels')
+
+# Encoders used to bring a mismatched clip to the target profile
+VIDEO_ENCODERS = {'h264': 'libx264', 'hevc': 'libx265'}
+AUDIO_ENCODERS = {'aac': 'aac', 'mp3': 'libmp3lame', 'opus': 'libopus'}
+# Normalized intro/outro clips are reused across runs, up to this much disk
+NORMALIZED_CACHE_MAX_BYTES = 20 * 1024 ** 3
 
 def check_ffmpeg():
     try:
@@ -26,36 +47,38 @@ def validate_input_files(file_paths):
     return valid_files
 
 def get_video_duration(file_path):
-    result = subprocess.run([
-        "ffprobe",
-        "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        file_path
-    ], capture_output=True, text=True, check=True)
-    
-    return float(result.stdout)
+    return probe.get_duration(file_path)
 
+def get_total_duration(file_paths):
+    """
+    Returns the summed duration of the files, used as the progress target of a join,
+    or None if any of them cannot be probed.
+    """
+    durations = probe_in_parallel(probe.get_duration_or_none, file_paths)
+    return None if None in durations else sum(durations)
+
+def probe_in_parallel(func, file_paths):
+    """
+    Calls func on every file on a bounded thread pool and returns the results in input order.
+    """
+    if not file_paths:
+        return []
+    with ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(file_paths))) as executor:
+        return list(executor.map(func, file_paths))
+
+@tracing.traced
 def process_timestamps(input_files, timestamp_files):
     merged_timestamps = []
     current_offset = 0.0
+    video_durations = probe_in_parallel(get_video_duration, input_files[:len(timestamp_files)])
 
     for i, timestamp_file in enumerate(timestamp_files):
-        video_duration = get_video_duration(input_files[i])
+        video_duration = video_durations[i]
         video_name = os.path.basename(input_files[i])
+        timemap = TimeMap(offset=current_offset)
         
         if timestamp_file is None:
-            if current_offset < 3600:  # Less than 1 hour
-                minutes = int(current_offset // 60)
-                seconds = int(current_offset % 60)
-                new_timestamp = f"{minutes:02d}:{seconds:02d}"
-            else:
-                hours = int(current_offset // 3600)
-                minutes = int((current_offset % 3600) // 60)
-                seconds = int(current_offset % 60)
-                new_timestamp = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-            merged_timestamps.append(f"{new_timestamp} {video_name}")
-            current_offset += video_duration
+            merged_timestamps.append(f"{format_timestamp(timemap.map(0))} {video_name}")
         else:
             with open(timestamp_file, 'r') as f:
                 lines = f.readlines()
@@ -69,33 +92,14 @@ def process_timestamps(input_files, timestamp_files):
                 description = parts[1] if len(parts) > 1 else video_name
                 
                 try:
-                    time_parts = timestamp.split(':')
-                    if len(time_parts) == 2:  # MM:SS format
-                        minutes, seconds = map(int, time_parts)
-                        total_seconds = minutes * 60 + seconds + current_offset
-                    elif len(time_parts) == 3:  # HH:MM:SS format
-                        hours, minutes, seconds = map(int, time_parts)
-                        total_seconds = hours * 3600 + minutes * 60 + seconds + current_offset
-                    else:
-                        print(f"Invalid timestamp format: {timestamp}")
-                        continue
-
-                    if total_seconds < 3600:  # Less than 1 hour
-                        minutes = int(total_seconds // 60)
-                        seconds = int(total_seconds % 60)
-                        new_timestamp = f"{minutes:02d}:{seconds:02d}"
-                    else:
-                        hours = int(total_seconds // 3600)
-                        minutes = int((total_seconds % 3600) // 60)
-                        seconds = int(total_seconds % 60)
-                        new_timestamp = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-                        
-                    merged_timestamps.append(f"{new_timestamp} {description}")
+                    total_seconds = timemap.map(parse_timestamp(timestamp))
                 except ValueError:
                     print(f"Invalid timestamp: {timestamp}")
                     continue
 
-            current_offset += video_duration
+                merged_timestamps.append(f"{format_timestamp(total_seconds)} {description}")
+
+        current_offset += video_duration
 
     return merged_timestamps
 
@@ -106,48 +110,37 @@ def write_merged_timestamps(merged_timestamps, output_timestamp_file):
 
 def get_media_info(file_path):
     media_info = {}
+    try:
+        v_stream = probe.get_stream(file_path, "video")
+        a_stream = probe.get_stream(file_path, "audio")
+    except subprocess.CalledProcessError:
+        v_stream = a_stream = None
+
     # Video info
-    result = subprocess.run([
-        "ffprobe",
-        "-v", "error",
-        "-select_streams", "v:0",
-        "-show_entries", "stream=codec_name,width,height,r_frame_rate",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        file_path
-    ], capture_output=True, text=True)
-    v_info = result.stdout.strip().split('\n')
-    if len(v_info) >= 4:
-        media_info['v_codec'] = v_info[0]
-        media_info['width'] = v_info[1]
-        media_info['height'] = v_info[2]
-        media_info['frame_rate'] = v_info[3]
+    if v_stream:
+        media_info['v_codec'] = v_stream.get('codec_name')
+        media_info['width'] = str(v_stream.get('width'))
+        media_info['height'] = str(v_stream.get('height'))
+        media_info['frame_rate'] = v_stream.get('r_frame_rate')
+        media_info['pix_fmt'] = v_stream.get('pix_fmt')
+        media_info['time_base'] = v_stream.get('time_base')
+        media_info['v_profile'] = v_stream.get('profile')
     else:
         media_info['v_codec'] = None
 
     # Audio info
-    result = subprocess.run([
-        "ffprobe",
-        "-v", "error",
-        "-select_streams", "a:0",
-        "-show_entries", "stream=codec_name,sample_rate,channels",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        file_path
-    ], capture_output=True, text=True)
-    a_info = result.stdout.strip().split('\n')
-    if len(a_info) >= 3:
-        media_info['a_codec'] = a_info[0]
-        media_info['sample_rate'] = a_info[1]
-        media_info['channels'] = a_info[2]
+    if a_stream:
+        media_info['a_codec'] = a_stream.get('codec_name')
+        media_info['sample_rate'] = a_stream.get('sample_rate')
+        media_info['channels'] = str(a_stream.get('channels'))
     else:
         media_info['a_codec'] = None
 
     return media_info
 
+@tracing.traced
 def check_media_compatibility(valid_files):
-    media_infos = []
-    for file in valid_files:
-        info = get_media_info(file)
-        media_infos.append(info)
+    media_infos = probe_in_parallel(get_media_info, valid_files)
 
     # Now compare parameters
     first_info = media_infos[0]
@@ -162,6 +155,12 @@ def check_media_compatibility(valid_files):
         if info['frame_rate'] != first_info['frame_rate']:
             print(f"Warning: Frame rate of file {valid_files[i]} ({info['frame_rate']}) does not match the first file ({first_info['frame_rate']})")
             incompatible = True
+        if info.get('pix_fmt') != first_info.get('pix_fmt'):
+            print(f"Warning: Pixel format of file {valid_files[i]} ({info.get('pix_fmt')}) does not match the first file ({first_info.get('pix_fmt')})")
+            incompatible = True
+        if info.get('time_base') != first_info.get('time_base'):
+            print(f"Warning: Video time base of file {valid_files[i]} ({info.get('time_base')}) does not match the first file ({first_info.get('time_base')})")
+            incompatible = True
         if info['a_codec'] != first_info['a_codec']:
             print(f"Warning: Audio codec of file {valid_files[i]} ({info['a_codec']}) does not match the first file ({first_info['a_codec']})")
             incompatible = True
@@ -174,57 +173,187 @@ def check_media_compatibility(valid_files):
 
     return incompatible, media_infos
 
-def concatenate_videos(input_files, output_file, incompatible):
+def media_profile(info):
+    return tuple(info.get(key) for key in PROFILE_KEYS)
+
+@tracing.traced
+def plan_normalization(media_infos):
+    """
+    Picks the most common media profile as the target and lists the inputs that differ from it.
+
+    Returns:
+        tuple: (target, mismatched) where target maps PROFILE_KEYS to values and mismatched
+               holds the indexes of the inputs that must be transcoded, or (None, None) when
+               the target profile can't be encoded and only a full re-encode will do.
+    """
+    counts = Counter(media_profile(info) for info in media_infos)
+    # most_common breaks ties by first appearance, so an even split favours the earliest clips
+    target_profile = counts.most_common(1)[0][0]
+    target = dict(zip(PROFILE_KEYS, target_profile))
+    target['v_profile'] = next(info.get('v_profile') for info in media_infos if media_profile(info) == target_profile)
+    if target['v_codec'] not in VIDEO_ENCODERS or (target['a_codec'] and target['a_codec'] not in AUDIO_ENCODERS):
+        return None, None
+
+    mismatched = [i for i, info in enumerate(media_infos) if media_profile(info) != target_profile]
+    return target, mismatched
+
+def normalize_clip(input_file, output_file, target, info):
+    """
+    Transcodes one input to the target profile so it can be joined with the others by stream copy.
+    Clips with a different aspect ratio are letterboxed, and clips without audio get silence.
+    """
+    width, height = target['width'], target['height']
+    video_filter = (
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,"
+        f"fps={target['frame_rate']},format={target['pix_fmt']}"
+    )
+    cmd = ['ffmpeg', '-i', input_file]
+    audio_input = '0:a:0'
+    if target['a_codec'] and not info.get('a_codec'):
+        cmd += ['-f', 'lavfi', '-i', f"anullsrc=sample_rate={target['sample_rate']}"]
+        audio_input = '1:a:0'
+
+    cmd += ['-map', '0:v:0', '-vf', video_filter, '-c:v', VIDEO_ENCODERS[target['v_codec']]]
+    profile = X264_PROFILES.get(target.get('v_profile'))
+    if target['v_codec'] == 'h264' and profile:
+        cmd += ['-profile:v', profile]
+    if target['a_codec']:
+        cmd += [
+            '-map', audio_input,
+            '-c:a', AUDIO_ENCODERS[target['a_codec']],
+            '-ar', str(target['sample_rate']),
+            '-ac', str(target['channels']),
+            '-shortest'
+        ]
+    # Matching the time base is what keeps copied and transcoded clips from freezing after the join
+    cmd += ['-video_track_timescale', target['time_base'].split('/')[1]]
+    cmd += ['-movflags', '+faststart', '-f', 'mp4', '-y', output_file]
+
+    print(f"Normalizing {input_file} to {width}x{height} {target['v_codec']} @ {target['frame_rate']}")
+    run_ffmpeg(cmd, get_total_duration([input_file]), desc="Normalizing")
+
+@tracing.traced
+def get_normalized_clip(input_file, target, info, temp_dir, use_cache=True):
+    """
+    Returns the path of input_file transcoded to the target profile.
+
+    With use_cache the result lives in a content-addressed cache keyed by the source's content hash
+    and the target profile, so the same clip joined to a new episode is only transcoded once.
+    The cache is not trimmed here, since that could evict a clip this join still needs; callers
+    run cache.evict_lru once the join is done. Without use_cache the transcode is written to temp_dir.
+    """
+    if not use_cache:
+        fd, output_file = tempfile.mkstemp(dir=temp_dir, suffix=".mp4")
+        os.close(fd)
+        normalize_clip(input_file, output_file, target, info)
+        return output_file
+
+    key = cache.params_key(cache.content_hash(input_file), *media_profile(target), target.get('v_profile'))
+    directory = cache.cache_dir("normalized")
+    cached_file = os.path.join(directory, f"{key}.mp4")
+    if os.path.exists(cached_file):
+        os.utime(cached_file)
+        print(f"Using cached normalized copy of {input_file}")
+        return cached_file
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        normalize_clip(input_file, temp_path, target, info)
+        os.replace(temp_path, cached_file)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return cached_file
+
+@tracing.traced
+def concat_demuxer(input_files, output_file):
+    with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix='.txt') as temp_file:
+        for file in input_files:
+            temp_file.write(f"file '{file}'\n")
+        temp_file_name = temp_file.name
+
+    try:
+        cmd = [
+            "ffmpeg",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", temp_file_name,
+            "-c", "copy",
+            "-movflags", "+faststart",
+            "-y", output_file
+        ]
+        
+        print(f"Running FFmpeg command: {' '.join(cmd)}")
+        run_ffmpeg(cmd, get_total_duration(input_files), desc="Concatenating")
+        print(f"Concatenation complete. Output saved to {output_file}")
+    except subprocess.CalledProcessError as e:
+        print(f"Error during concatenation: {e}\nFFmpeg output: {e.stderr}")
+    finally:
+        os.unlink(temp_file_name)
+
+@tracing.traced
+def concatenate_videos(input_files, output_file, incompatible, media_infos=None, use_cache=True, cache_max_bytes=NORMALIZED_CACHE_MAX_BYTES):
     if not incompatible:
         # Use concat demuxer
-        with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix='.txt') as temp_file:
-            for file in input_files:
-                temp_file.write(f"file '{file}'\n")
-            temp_file_name = temp_file.name
+        concat_demuxer(input_files, output_file)
+        return
 
+    target, mismatched = plan_normalization(media_infos) if media_infos else (None, None)
+    if target is not None:
+        # Only transcode the odd ones out, then join everything by stream copy
+        print(f"Normalizing {len(mismatched)} of {len(input_files)} files to match the others")
+        normalized_files = list(input_files)
+        # Transcodes need about as much room as the clips being normalized, on the disk they are written to:
+        # the cache, or without it a private workspace on the scratch disk
+        required_bytes = int(sum(os.path.getsize(input_files[i]) for i in mismatched) * 1.1)
+        workspace = None
+        temp_dir = None
+        if use_cache:
+            check_free_space(cache.cache_dir("normalized"), required_bytes)
+        else:
+            workspace = Workspace("concatenator", required_bytes=required_bytes)
+            temp_dir = workspace.create()
         try:
-            cmd = [
-                "ffmpeg",
-                "-f", "concat",
-                "-safe", "0",
-                "-i", temp_file_name,
-                "-c", "copy",
-                "-movflags", "+faststart",
-                output_file
-            ]
-            
-            print(f"Running FFmpeg command: {' '.join(cmd)}")
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            print(f"Concatenation complete. Output saved to {output_file}")
+            for i in mismatched:
+                normalized_files[i] = get_normalized_clip(input_files[i], target, media_infos[i], temp_dir, use_cache)
+            concat_demuxer(normalized_files, output_file)
         except subprocess.CalledProcessError as e:
-            print(f"Error during concatenation: {e}\nFFmpeg output: {e.stderr.decode()}")
+            print(f"Error during normalization: {e}\nFFmpeg output: {e.stderr}")
         finally:
-            os.unlink(temp_file_name)
-    else:
-        # Use concat filter with re-encoding
-        inputs = []
-        filter_complex = ''
-        for idx, file in enumerate(input_files):
-            inputs.extend(['-i', file])
-            filter_complex += f'[{idx}:v:0][{idx}:a:0]'
-        filter_complex += f'concat=n={len(input_files)}:v=1:a=1[outv][outa]'
-        cmd = ['ffmpeg']
-        cmd.extend(inputs)
-        cmd.extend([
-            '-filter_complex', filter_complex,
-            '-map', '[outv]',
-            '-map', '[outa]',
-            '-movflags', '+faststart',
-            output_file
-        ])
-        print(f"Running FFmpeg command: {' '.join(cmd)}")
-        try:
-            subprocess.run(cmd, check=True)
-            print(f"Concatenation complete with re-encoding. Output saved to {output_file}")
-        except subprocess.CalledProcessError as e:
-            print(f"Error during concatenation: {e}\nFFmpeg output: {e.stderr.decode()}")
+            # Trimmed only after the join, so no clip of this run disappears before ffmpeg reads it
+            if use_cache:
+                cache.evict_lru("normalized", cache_max_bytes)
+            if workspace is not None:
+                workspace.cleanup()
+        return
+
+    # Use concat filter with re-encoding
+    inputs = []
+    filter_complex = ''
+    for idx, file in enumerate(input_files):
+        inputs.extend(['-i', file])
+        filter_complex += f'[{idx}:v:0][{idx}:a:0]'
+    filter_complex += f'concat=n={len(input_files)}:v=1:a=1[outv][outa]'
+    cmd = ['ffmpeg']
+    cmd.extend(inputs)
+    cmd.extend([
+        '-filter_complex', filter_complex,
+        '-map', '[outv]',
+        '-map', '[outa]',
+        '-movflags', '+faststart',
+        '-y', output_file
+    ])
+    print(f"Running FFmpeg command: {' '.join(cmd)}")
+    try:
+        run_ffmpeg(cmd, get_total_duration(input_files), desc="Concatenating")
+        print(f"Concatenation complete with re-encoding. Output saved to {output_file}")
+    except subprocess.CalledProcessError as e:
+        print(f"Error during concatenation: {e}\nFFmpeg output: {e.stderr}")
 
-def main(input_files, timestamp_files, output_file, output_timestamp_file):
+@tracing.traced
+def main(input_files, timestamp_files, output_file, output_timestamp_file, use_cache=True, cache_max_bytes=NORMALIZED_CACHE_MAX_BYTES, overwrite=False):
     if not check_ffmpeg():
         print("FFmpeg is not installed or not in the system PATH.")
         return
@@ -234,6 +363,11 @@ def main(input_files, timestamp_files, output_file, output_timestamp_file):
         print("No valid input files found.")
         return
 
+    # ffmpeg always runs with -y, so an existing output is only replaced once the caller has confirmed it
+    if os.path.exists(output_file) and not overwrite:
+        print(f"File '{output_file}' already exists - not overwriting")
+        return
+
     incompatible, media_infos = check_media_compatibility(valid_files)
 
     if timestamp_files:
@@ -242,7 +376,7 @@ def main(input_files, timestamp_files, output_file, output_timestamp_file):
     else:
         print("No timestamp files provided. Skipping timestamp processing.")
 
-    concatenate_videos(valid_files, output_file, incompatible)
+    concatenate_videos(valid_files, output_file, incompatible, media_infos, use_cache, cache_max_bytes)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Concatenate videos and merge timestamps.")
@@ -250,10 +384,27 @@ if __name__ == '__main__':
     parser.add_argument('-it', '--input-timestamps', nargs='+', help="Input timestamp files (.txt). Use 'None' for missing files.")
     parser.add_argument('-ov', '--output-videos', required=True, help="Output video file (.mp4)")
     parser.add_argument('-ot', '--output-timestamps', help="Output timestamp file (.txt)")
+    parser.add_argument('--no-cache', action='store_true', help="Don't reuse or store normalized copies of mismatched clips")
+    parser.add_argument('--trace', metavar='TRACE_JSON', help="Record timing spans for every stage and ffmpeg run and save them in Chrome trace format")
+    parser.add_argument('--cache-size-gb', type=float, default=NORMALIZED_CACHE_MAX_BYTES / 1024 ** 3, help="Disk budget for cached normalized clips. Default 20 GB")
 
     args = parser.parse_args()
 
     # Convert "None" strings to None objects
     timestamp_files = [None if t == "None" else t for t in args.input_timestamps] if args.input_timestamps else None
 
-    main(args.input_videos, timestamp_files, args.output_videos, args.output_timestamps)
\ No newline at end of file
+    # ffmpeg runs without a terminal attached, so its own overwrite prompt is asked here instead
+    overwrite = False
+    if os.path.exists(args.output_videos):
+        if input(f"File '{args.output_videos}' already exists. Overwrite? [y/N] ").strip().lower() != 'y':
+            print("Not overwriting - exiting")
+            raise SystemExit(0)
+        overwrite = True
+
+    if args.trace:
+        tracing.enable()
+    try:
+        main(args.input_videos, timestamp_files, args.output_videos, args.output_timestamps, not args.no_cache, int(args.cache_size_gb * 1024 ** 3), overwrite)
+    finally:
+        if args.trace:
+            tracing.write_chrome_trace(args.trace)
\ No newline at end of file
@@ -19,7 +19,8 @@ class ProcessThread(QThread):
         try:
             # Convert "[No Timestamp File]" to None for compatibility with the logic script
             adjusted_timestamp_files = [None if t == "[No Timestamp File]" else t for t in self.timestamp_files]
-            concatenator_main(self.input_files, adjusted_timestamp_files, self.output_file, self.output_timestamp_file)
+            # The save dialog has already asked whether to replace an existing file
+            concatenator_main(self.input_files, adjusted_timestamp_files, self.output_file, self.output_timestamp_file, overwrite=True)
             self.finished.emit()
         except Exception as e:
             self.error.emit(str(e))
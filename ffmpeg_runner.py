@@ -0,0 +1,131 @@
+"""
+ffmpeg_runner.py
+
+Runs ffmpeg while following how far it has got. ffmpeg is started with -progress pipe:1, which
+prints a block of key=value lines on stdout about twice a second; every block becomes an
+FFmpegProgress, whose percent done comes from out_time_us against the expected output duration.
+
+stderr goes to a temporary file rather than a pipe, so a chatty encode can never stall on a full
+pipe, and its text is attached to the CalledProcessError when ffmpeg fails.
+"""
+
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+
+from tqdm import tqdm
+
+import tracing
+
+@dataclass
+class FFmpegProgress:
+    """
+    One progress report of a running ffmpeg process.
+
+    out_time is how many seconds of output have been written, duration the expected output length
+    (None when unknown), fps the frames encoded per second and speed how many times faster than
+    real time the encode is running. done is set on the final report.
+    """
+    out_time: float
+    duration: Optional[float] = None
+    fps: Optional[float] = None
+    speed: Optional[float] = None
+    done: bool = False
+
+    @property
+    def fraction(self):
+        """
+        Fraction of the output written so far, or None when the expected duration is unknown.
+        """
+        if self.done:
+            return 1.0
+        if not self.duration:
+            return None
+        return min(1.0, max(0.0, self.out_time / self.duration))
+
+    def describe(self):
+        """
+        Short human readable summary, e.g. '42%, 61.0 fps, 2.4x'.
+        """
+        parts = []
+        if self.fraction is not None:
+            parts.append(f"{self.fraction:.0%}")
+        if self.fps:
+            parts.append(f"{self.fps:.1f} fps")
+        if self.speed:
+            parts.append(f"{self.speed:.1f}x")
+        return ", ".join(parts)
+
+def _parse_number(value):
+    try:
+        return float(value.rstrip('x'))
+    except (AttributeError, ValueError):
+        return None  # ffmpeg reports N/A until the first frame is out
+
+def _progress_from_fields(fields, duration, last_out_time):
+    out_time_us = _parse_number(fields.get('out_time_us', fields.get('out_time_ms')))
+    # out_time briefly reads N/A or jumps back while a muxer is flushing, so it never moves backwards here
+    out_time = out_time_us / 1e6 if out_time_us is not None else 0.0
+    return FFmpegProgress(
+        out_time=max(last_out_time, out_time),
+        duration=duration,
+        fps=_parse_number(fields.get('fps')),
+        speed=_parse_number(fields.get('speed')),
+        done=fields.get('progress') == 'end',
+    )
+
+def tqdm_callback(bar):
+    """
+    Returns an on_progress callback that moves a tqdm bar, whose total is in seconds, to each reported out_time.
+    """
+    def on_progress(progress):
+        position = bar.total if progress.done else min(progress.out_time, bar.total)
+        bar.update(position - bar.n)
+        rates = [f"{progress.fps:.1f} fps" if progress.fps else "", f"{progress.speed:.1f}x" if progress.speed else ""]
+        bar.set_postfix_str(", ".join(rate for rate in rates if rate), refresh=False)
+    return on_progress
+
+def run_ffmpeg(cmd, duration=None, on_progress=None, desc=None):
+    """
+    Runs an ffmpeg command line and reports its progress.
+
+    Args:
+        cmd (list): The full command line, starting with the ffmpeg executable.
+        duration (float): Expected duration of the output in seconds, used to work out the percent done.
+        on_progress (callable): Called with an FFmpegProgress after every progress report.
+        desc (str): When given along with duration, a tqdm bar with this description is shown as well.
+
+    Raises:
+        subprocess.CalledProcessError: If ffmpeg exits with an error. Its stderr holds ffmpeg's log as text.
+    """
+    cmd = [cmd[0], '-progress', 'pipe:1', '-nostats'] + list(cmd[1:])
+    bar = tqdm(total=duration, desc=desc, unit="s", bar_format="{l_bar}{bar}| {n:.0f}/{total:.0f}s [{elapsed}<{remaining}{postfix}]") if desc and duration else None
+    callbacks = [callback for callback in (on_progress, bar and tqdm_callback(bar)) if callback]
+
+    fields = {}
+    last_out_time = 0.0
+    with tracing.span("ffmpeg", "subprocess", cmd=" ".join(cmd)), tempfile.TemporaryFile() as stderr_file:
+        # stdin is closed so ffmpeg never waits on an overwrite prompt or a keypress
+        process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=stderr_file, text=True)
+        try:
+            for line in process.stdout:
+                key, separator, value = line.strip().partition('=')
+                if not separator:
+                    continue
+                fields[key] = value
+                # 'progress' closes every block of fields
+                if key == 'progress':
+                    progress = _progress_from_fields(fields, duration, last_out_time)
+                    last_out_time = progress.out_time
+                    for callback in callbacks:
+                        callback(progress)
+        finally:
+            process.stdout.close()
+            return_code = tracing.wait(process)
+            if bar is not None:
+                bar.close()
+
+        if return_code != 0:
+            stderr_file.seek(0)
+            raise subprocess.CalledProcessError(return_code, cmd, stderr=stderr_file.read().decode(errors='replace'))
@@ -0,0 +1,93 @@
+"""
+probe.py
+
+One place to ask ffprobe about a media file. Every file is probed at most once with a single
+JSON call covering both format and streams. Results are memoized in-process and stored in the
+on-disk cache keyed by path, size and mtime, so reopening the same project costs no ffprobe runs.
+"""
+
+import json
+import subprocess
+import threading
+
+import cache
+import tracing
+
+# Probe results are a few KB each
+PROBE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+def probe(input_file):
+    """
+    Returns ffprobe's JSON description of a file, with 'format' and 'streams' keys.
+
+    Raises:
+        subprocess.CalledProcessError: If ffprobe cannot read the file.
+    """
+    key = cache.file_key(input_file)
+    with _memo_lock:
+        if key in _memo:
+            return _memo[key]
+
+    info = cache.load_json("probe", key)
+    if info is None:
+        cmd = [
+            "ffprobe",
+            "-v", "error",
+            "-print_format", "json",
+            "-show_format",
+            "-show_streams",
+            input_file
+        ]
+        with tracing.span("ffprobe", "subprocess", cmd=" ".join(cmd)):
+            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        info = json.loads(result.stdout)
+        info.setdefault("format", {})
+        info.setdefault("streams", [])
+        cache.save_json("probe", key, info, PROBE_CACHE_MAX_BYTES)
+
+    with _memo_lock:
+        _memo[key] = info
+    return info
+
+def get_stream(input_file, codec_type):
+    """
+    Returns the first stream of the given codec_type ('video' or 'audio'), or None if there is none.
+    """
+    for stream in probe(input_file)["streams"]:
+        if stream.get("codec_type") == codec_type:
+            return stream
+    return None
+
+def get_duration(input_file):
+    """
+    Returns the container duration in seconds.
+    """
+    return float(probe(input_file)["format"]["duration"])
+
+def get_duration_or_none(input_file):
+    """
+    Returns the container duration in seconds, or None if the file can't be probed or has no duration.
+    For progress reporting, where a missing duration is not an error.
+    """
+    try:
+        return get_duration(input_file)
+    except (subprocess.CalledProcessError, OSError, KeyError, ValueError):
+        return None
+
+def get_video_dimensions(input_file):
+    """
+    Returns (width, height) of the first video stream.
+
+    Raises:
+        ValueError: If the file has no video stream or it has no dimensions.
+    """
+    stream = get_stream(input_file, "video")
+    if stream is None:
+        raise ValueError("No video stream found.")
+    width, height = stream.get("width"), stream.get("height")
+    if not (width and height):
+        raise ValueError("Could not determine video width/height.")
+    return width, height
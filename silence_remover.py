@@ -2,108 +2,727 @@ import argparse
 import os
 import subprocess
 from tqdm import tqdm
-import shutil
+import tempfile
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import List, Optional
 import ffmpeg
+import numpy as np
+import cache
+import chunk_sizing
+import probe
+from ffmpeg_runner import run_ffmpeg
+import smart_cut
+import tracing
+from workspace import Workspace
+from timemap import TimeMap, parse_timestamp, format_timestamp, remap_captions
 from datetime import timedelta
 
-def process_video(input_file, output_file, chunk_duration, db_threshold, buffer_duration, timestamps_file=None, output_timestamps_file=None):
-    temp_dir = "temp_chunks"
-    os.makedirs(temp_dir, exist_ok=True)
-    
-    min_silence_length = buffer_duration * 4
-    
+# Silence detection works on a mono, low sample rate decode of the audio track only
+ENVELOPE_SAMPLE_RATE = 16000
+ENVELOPE_FRAME_DURATION = 0.01  # seconds of audio summarised by each envelope value
+
+# Raw silence maps are tiny, this keeps thousands of them
+SILENCE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Envelopes cost 400 bytes per second of input, this keeps roughly 80 three-hour recordings
+ENVELOPE_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# aselect keeps or drops whole audio frames, small frames keep audio cuts within a few ms of the video cuts
+SELECT_AUDIO_FRAME_SAMPLES = 256
+
+# Part boundaries are moved this far back before the select tests, so a frame stamped exactly on a
+# boundary is judged consistently despite rounding in its timestamp
+SELECT_TOLERANCE = 0.0001
+
+# Every processed chunk is encoded with exactly these settings so the final join can be a stream copy
+CHUNK_ENCODE_ARGS = [
+    '-c:v', 'libx264', '-preset', 'medium', '-crf', '23', '-pix_fmt', 'yuv420p',
+    '-c:a', 'aac', '-b:a', '192k',
+    '-video_track_timescale', '90000'
+]
+
+# Chunks are re-encoded at a similar bitrate to the source, so scratch space is sized from the input plus a margin
+SCRATCH_SIZE_FACTOR = 1.1
+
+# Bump when the manifest layout or the chunk rendering changes, so old resumable jobs are not reused
+MANIFEST_VERSION = 2
+MANIFEST_FILE = "manifest.json"
+
+# Share of a whole run taken by each stage, used to turn stage progress into overall progress
+PROGRESS_STAGES = {
+    "detect": (0.0, 0.15),
+    "render": (0.15, 0.95),
+    "concat": (0.95, 1.0),
+}
+
+@dataclass
+class ProgressEvent:
+    """
+    One progress report from process_video.
+
+    stage is 'detect', 'render' or 'concat', fraction is how much of that stage is done (0 to 1)
+    and eta is the estimated number of seconds left in the stage, or None before it can be estimated.
+    """
+    stage: str
+    fraction: float
+    eta: Optional[float] = None
+
+    @property
+    def overall(self):
+        """
+        Fraction of the whole run that is done, weighting each stage by PROGRESS_STAGES.
+        """
+        start, end = PROGRESS_STAGES.get(self.stage, (0.0, 1.0))
+        return start + (end - start) * self.fraction
+
+@dataclass
+class SilenceRemovalResult:
+    """
+    What process_video produced. Intervals are the removed [start, end] parts in source time.
+    """
+    input_file: str
+    output_file: str
+    duration: float
+    removed_duration: float
+    silence_intervals: List[List[float]] = field(default_factory=list)
+    output_timestamps_file: Optional[str] = None
+    output_captions_file: Optional[str] = None
+
+    @property
+    def output_duration(self):
+        return self.duration - self.removed_duration
+
+def stage_reporter(progress_callback, stage):
+    """
+    Returns a report(done, total) function that sends ProgressEvents for one stage to progress_callback,
+    estimating the time left from how long the stage has taken so far. Returns None without a callback.
+    """
+    if progress_callback is None:
+        return None
+    started = time.monotonic()
+
+    def report(done, total):
+        fraction = min(1.0, done / total) if total else 1.0
+        eta = None
+        if fraction >= 1.0:
+            eta = 0.0
+        elif fraction > 0:
+            eta = (time.monotonic() - started) * (1 - fraction) / fraction
+        progress_callback(ProgressEvent(stage, fraction, eta))
+    return report
+
+@tracing.traced
+def process_video(input_file, output_file, chunk_duration, db_threshold, buffer_duration, timestamps_file=None, output_timestamps_file=None, jobs=1, render_mode="reencode", min_silence_length=None, use_cache=True, captions_file=None, output_captions_file=None, work_dir=None, progress_callback=None, resume=False, concurrent_runs=1):
+    """
+    Removes the silences from input_file and writes the result to output_file.
+
+    Args:
+        chunk_duration (int or str): Seconds of source per rendered chunk, or 'auto' to choose the
+                                     longest chunks that fit in memory with jobs encoders running.
+        progress_callback (callable): Called with a ProgressEvent as each stage advances, or None.
+        resume (bool): Keep the job's scratch directory and manifest if the run fails, and pick up
+                       from them when the same job is run again. Only chunks that are missing or
+                       fail verification are rendered again.
+        concurrent_runs (int): How many videos are being processed at the same time, so an 'auto'
+                               chunk_duration leaves memory for the other runs' encoders too.
+
+    Returns:
+        SilenceRemovalResult: The removed intervals and the files that were written.
+    """
+    if min_silence_length is None:
+        min_silence_length = buffer_duration * 4
+
+    # Every run gets its own scratch directory so several videos can be processed at once.
+    # A resumable one is keyed by the input's content and every setting that shapes the chunks.
+    job_key = None
+    if resume:
+        job_key = cache.params_key(
+            cache.content_hash(input_file), db_threshold, buffer_duration, min_silence_length,
+            chunk_duration, render_mode, " ".join(CHUNK_ENCODE_ARGS), MANIFEST_VERSION
+        )
+    workspace = Workspace("silence_remover", work_dir, int(os.path.getsize(input_file) * SCRATCH_SIZE_FACTOR), job_key)
+    temp_dir = workspace.create()
+    manifest_file = os.path.join(temp_dir, MANIFEST_FILE) if resume else None
+    succeeded = False
     try:
-        # Split video into chunks
-        chunk_list = split_video(input_file, chunk_duration, temp_dir)
-        
-        processed_chunks = []
-        silence_intervals = []
-        total_silence_duration = 0
-        cumulative_silence_removal = []
-        
-        for i, chunk in enumerate(tqdm(chunk_list, desc="Processing chunks")):
-            silence_parts, chunk_duration = detect_silence(chunk, db_threshold, buffer_duration, min_silence_length)
-            output_chunk = f"{temp_dir}/processed_chunk_{i}.mp4"
-            chunk_silence_duration = cut_silence(chunk, silence_parts, chunk_duration, output_chunk)
-            
-            # Record silence intervals with their original start times
-            chunk_start_time = i * chunk_duration
-            for start, end in silence_parts:
-                silence_intervals.append((chunk_start_time + start, chunk_start_time + end))
-            
-            total_silence_duration += chunk_silence_duration
-            cumulative_silence_removal.append(total_silence_duration)
-            processed_chunks.append(output_chunk)
-        
+        manifest = load_manifest(manifest_file) if resume else None
+        if manifest and manifest.get("silence_intervals") is not None:
+            print(f"Resuming job in {temp_dir}")
+            silence_intervals, duration = manifest["silence_intervals"], manifest["duration"]
+        else:
+            # Detect silences over the whole video in a single audio-only pass
+            silence_intervals, duration = detect_silence(
+                input_file, db_threshold, buffer_duration, min_silence_length, use_cache, detection_reporter(input_file, progress_callback)
+            )
+            if resume:
+                manifest = {"version": MANIFEST_VERSION, "input_file": os.path.abspath(input_file),
+                            "silence_intervals": silence_intervals, "duration": duration}
+
+        if chunk_duration == "auto" and render_mode != "smart":
+            # A resumed job keeps the length it started with, or its finished chunks would not line up
+            if manifest and manifest.get("chunk_duration"):
+                chunk_duration = manifest["chunk_duration"]
+            else:
+                chunk_duration = chunk_sizing.auto_chunk_duration(input_file, silence_intervals, duration, jobs, concurrent_runs)
+                if manifest is not None:
+                    manifest["chunk_duration"] = chunk_duration
+        if manifest is not None:
+            save_manifest(manifest_file, manifest)
+
+        if render_mode == "smart":
+            # Work on the whole source at once, copying whole GOPs and re-encoding only the cut boundaries
+            keep_parts = compute_keep_parts(silence_intervals, duration)
+            copied, encoded = smart_cut.smart_cut(
+                input_file, keep_parts, output_file, temp_dir, jobs, encoder_threads(jobs), stage_reporter(progress_callback, "render")
+            )
+            print(f"Smart cut stream-copied {timedelta(seconds=copied)} and re-encoded {timedelta(seconds=encoded)}")
+            if progress_callback:
+                # smart_cut joins its pieces itself, so the concat stage is done as soon as it returns
+                progress_callback(ProgressEvent("concat", 1.0, 0.0))
+            total_silence_duration = sum(end - start for start, end in silence_intervals)
+            cumulative_silence_removal = [total_silence_duration]
+        else:
+            total_silence_duration, cumulative_silence_removal = render_reencoded(
+                input_file, output_file, silence_intervals, duration, chunk_duration, temp_dir, jobs, progress_callback, manifest_file
+            )
+
         # Check for inconsistencies in silence intervals
         check_silence_intervals(silence_intervals, buffer_duration)
         
         # Debug check: compare cumulative silence removal with total from intervals
         debug_check_silence_removal(silence_intervals, cumulative_silence_removal)
         
-        # Concatenate processed chunks
-        concatenate_chunks(processed_chunks, output_file)
-        
         # Process timestamps if provided
         if timestamps_file:
             if not output_timestamps_file:
                 base, ext = os.path.splitext(timestamps_file)
                 output_timestamps_file = f"{base}_adjusted{ext}"
             process_timestamps(timestamps_file, output_timestamps_file, silence_intervals)
+
+        # Shift caption sidecars the same way
+        if captions_file:
+            if not output_captions_file:
+                base, ext = os.path.splitext(captions_file)
+                output_captions_file = f"{base}_adjusted{ext}"
+            process_captions(captions_file, output_captions_file, silence_intervals)
         
         # Log information about the process
         print(f"\nTotal silence removed: {timedelta(seconds=total_silence_duration)}")
         if timestamps_file:
             print(f"Adjusted timestamps saved to: {output_timestamps_file}")
-        
+        if captions_file:
+            print(f"Adjusted captions saved to: {output_captions_file}")
+
+        succeeded = True
+        return SilenceRemovalResult(
+            input_file=input_file,
+            output_file=output_file,
+            duration=duration,
+            removed_duration=total_silence_duration,
+            silence_intervals=silence_intervals,
+            output_timestamps_file=output_timestamps_file if timestamps_file else None,
+            output_captions_file=output_captions_file if captions_file else None,
+        )
     finally:
-        # Clean up temporary files
-        for file in os.listdir(temp_dir):
-            os.remove(os.path.join(temp_dir, file))
-        os.rmdir(temp_dir)
-
-def split_video(input_file, chunk_duration, temp_dir):
-    cmd = f'ffmpeg -i "{input_file}" -c copy -f segment -segment_time {chunk_duration} -reset_timestamps 1 {temp_dir}/chunk_%03d.mp4'
-    subprocess.run(cmd, shell=True, check=True)
-    return sorted([os.path.join(temp_dir, f) for f in os.listdir(temp_dir) if f.startswith("chunk_")])
-
-def detect_silence(input_chunk, db_threshold, buffer_duration, min_silence_length):
-    cmd = f"ffmpeg -i {input_chunk} -af silencedetect=noise={db_threshold}dB:d={min_silence_length} -f null -"
-    try:
-        output = subprocess.check_output(cmd, shell=True, stderr=subprocess.STDOUT).decode()
-    except subprocess.CalledProcessError as e:
-        print(f"Error running FFmpeg command: {e}")
-        return []
+        # Clean up temporary files, unless a failed resumable job can continue from them
+        if succeeded or not resume:
+            workspace.cleanup()
+        else:
+            print(f"Kept finished chunks in {temp_dir}, rerun with --resume to continue")
 
-    silence_parts = []
-    for line in output.split('\n'):
+@tracing.traced
+def plan_video(input_file, cut_list_file, db_threshold, buffer_duration, min_silence_length=None, timestamps_file=None, use_cache=True):
+    """
+    Runs detection only and reports what process_video would cut, without encoding any video.
+    The cut list is written to cut_list_file as JSON and returned.
+    """
+    if min_silence_length is None:
+        min_silence_length = buffer_duration * 4
+
+    silence_intervals, duration = detect_silence(input_file, db_threshold, buffer_duration, min_silence_length, use_cache)
+    keep_parts = compute_keep_parts(silence_intervals, duration)
+    removed_duration = sum(end - start for start, end in silence_intervals)
+
+    cut_list = {
+        "input_file": os.path.abspath(input_file),
+        "db_threshold": db_threshold,
+        "buffer_duration": buffer_duration,
+        "min_silence_length": min_silence_length,
+        "duration": duration,
+        "removed_duration": removed_duration,
+        "output_duration": duration - removed_duration,
+        "silence_intervals": silence_intervals,
+        "keep_parts": keep_parts,
+    }
+    with open(cut_list_file, 'w') as f:
+        json.dump(cut_list, f, indent=2)
+
+    print(f"Input duration: {timedelta(seconds=duration)}")
+    print(f"Silence to remove: {timedelta(seconds=removed_duration)} in {len(silence_intervals)} cuts")
+    print(f"Output duration: {timedelta(seconds=duration - removed_duration)} in {len(keep_parts)} segments")
+    if timestamps_file:
+        with open(timestamps_file, 'r') as f:
+            adjusted_timestamps = adjust_timestamps(f.readlines(), silence_intervals)
+        print("Adjusted timestamps:")
+        for timestamp in adjusted_timestamps:
+            print(timestamp)
+    print(f"Cut list saved to: {cut_list_file}")
+    return cut_list
+
+@tracing.traced
+def render_reencoded(input_file, output_file, silence_intervals, duration, chunk_duration, temp_dir, jobs=1, progress_callback=None, manifest_file=None):
+    """
+    Cuts the silences out of the input one chunk at a time and joins the results.
+    Render progress is reported per finished chunk, weighted by chunk length, then the join as one step.
+
+    With a manifest_file, the chunk plan and every finished chunk's content hash are recorded in it
+    as the render goes. Chunks the manifest already lists are verified against their hash and reused.
+
+    Returns:
+        tuple: (total_silence_duration, cumulative_silence_removal) where the latter holds the
+               running total of removed silence after every chunk.
+    """
+    chunk_list = plan_chunks(duration, chunk_duration, silence_intervals)
+
+    manifest = load_manifest(manifest_file) if manifest_file else None
+    completed = {}
+    if manifest is not None:
+        if manifest.get("chunks") == [list(chunk) for chunk in chunk_list]:
+            completed = verified_chunks(manifest.get("completed", {}), temp_dir)
+            if completed:
+                print(f"Reusing {len(completed)} of {len(chunk_list)} chunks from the previous run")
+        manifest["chunks"] = [list(chunk) for chunk in chunk_list]
+        manifest["completed"] = completed
+        save_manifest(manifest_file, manifest)
+
+    processed_chunks = []
+    tasks = []
+    task_chunks = []
+    chunk_silence_durations = []
+    for i, (chunk_start, chunk_end) in enumerate(chunk_list):
+        silence_parts = chunk_silence_parts(silence_intervals, chunk_start, chunk_end)
+        output_chunk = f"{temp_dir}/processed_chunk_{i}.mp4"
+        processed_chunks.append(output_chunk)
+        chunk_silence_durations.append(sum(end - start for start, end in silence_parts))
+        if str(i) not in completed:
+            tasks.append((input_file, silence_parts, chunk_end - chunk_start, output_chunk, chunk_start))
+            task_chunks.append(i)
+
+    memory_samples = []
+
+    def on_chunk_done(task_index, peak_rss):
+        if peak_rss is not None:
+            memory_samples.append((tasks[task_index][2], peak_rss))
+        if manifest is None:
+            return
+        # Runs in this process as each chunk finishes, so the manifest has a single writer
+        i = task_chunks[task_index]
+        output_chunk = processed_chunks[i]
+        completed[str(i)] = {
+            "file": os.path.basename(output_chunk) if os.path.exists(output_chunk) else None,
+            "hash": cache.content_hash(output_chunk) if os.path.exists(output_chunk) else None,
+        }
+        save_manifest(manifest_file, manifest)
+
+    render_chunks(tasks, jobs, stage_reporter(progress_callback, "render"), on_chunk_done)
+    # What the encoders really used calibrates the next --chunk_duration auto on this format
+    chunk_sizing.record_chunk_memory(input_file, memory_samples)
+
+    total_silence_duration = 0
+    cumulative_silence_removal = []
+    for chunk_silence_duration in chunk_silence_durations:
+        total_silence_duration += chunk_silence_duration
+        cumulative_silence_removal.append(total_silence_duration)
+
+    # Concatenate processed chunks, fully silent chunks never produced an output file
+    report_concat = stage_reporter(progress_callback, "concat")
+    on_concat_progress = (lambda progress: report_concat(progress.fraction or 0.0, 1)) if report_concat else None
+    concatenate_chunks(
+        [chunk for chunk in processed_chunks if os.path.exists(chunk)], output_file,
+        duration - total_silence_duration, on_concat_progress
+    )
+    return total_silence_duration, cumulative_silence_removal
+
+@tracing.traced
+def plan_chunks(duration, chunk_duration, silence_intervals=()):
+    """
+    Divides the source timeline into consecutive [start, end] chunks of at most chunk_duration seconds.
+    Chunks are only time ranges; each one is read straight from the input with a seek when it's rendered.
+
+    When silence intervals are given, each boundary is moved back to the middle of the last silence
+    in the second half of the chunk, so chunk joins land inside removed silence instead of mid-speech.
+    """
+    chunk_list = []
+    start = 0.0
+    i = 0
+    while start < duration:
+        end = min(start + chunk_duration, duration)
+        if end < duration:
+            earliest = start + chunk_duration / 2
+            # Skip silences that end before this chunk's second half
+            while i < len(silence_intervals) and silence_intervals[i][1] <= earliest:
+                i += 1
+            j = i
+            best = None
+            while j < len(silence_intervals) and silence_intervals[j][0] < end:
+                middle = (max(silence_intervals[j][0], earliest) + min(silence_intervals[j][1], end)) / 2
+                best = middle
+                j += 1
+            if best is not None:
+                end = best
+        chunk_list.append((start, end))
+        start = end
+    return chunk_list
+
+@tracing.traced
+def compute_loudness_envelope(input_file, sample_rate=ENVELOPE_SAMPLE_RATE, frame_duration=ENVELOPE_FRAME_DURATION, on_progress=None):
+    """
+    Decodes the audio track once as downmixed mono PCM and computes its loudness envelope.
+    on_progress, if given, is called with the number of seconds decoded so far after every block.
+
+    Returns:
+        tuple: (levels, duration) where levels is a float32 array holding the RMS level in dB
+               of every frame_duration window and duration is the audio duration in seconds.
+    """
+    frame_size = int(round(sample_rate * frame_duration))
+    bytes_per_frame = frame_size * 4
+    block_size = bytes_per_frame * 1000  # read roughly 10 seconds of audio at a time
+
+    cmd = [
+        'ffmpeg', '-v', 'error', '-nostdin',
+        '-i', input_file,
+        '-vn', '-sn', '-dn',
+        '-ac', '1', '-ar', str(sample_rate),
+        '-f', 'f32le', '-'
+    ]
+
+    levels = []
+    total_samples = 0
+    leftover = b''
+    with tracing.span("ffmpeg", "subprocess", cmd=" ".join(cmd)), tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file)
+        try:
+            while True:
+                data = process.stdout.read(block_size)
+                if not data:
+                    break
+                data = leftover + data
+                usable = len(data) - len(data) % bytes_per_frame
+                leftover = data[usable:]
+                if not usable:
+                    continue
+                samples = np.frombuffer(data[:usable], dtype='<f4').reshape(-1, frame_size)
+                levels.append(_rms_db(samples))
+                total_samples += samples.size
+                if on_progress:
+                    on_progress(total_samples / sample_rate)
+        finally:
+            process.stdout.close()
+            return_code = tracing.wait(process)
+
+        if return_code != 0:
+            stderr_file.seek(0)
+            raise subprocess.CalledProcessError(return_code, cmd, stderr=stderr_file.read().decode(errors='replace'))
+
+    # The final partial window still gets its own level so trailing silence is not lost
+    leftover = leftover[:len(leftover) - len(leftover) % 4]
+    if leftover:
+        samples = np.frombuffer(leftover, dtype='<f4').reshape(1, -1)
+        levels.append(_rms_db(samples))
+        total_samples += samples.size
+
+    levels = np.concatenate(levels) if levels else np.empty(0, dtype=np.float32)
+    return levels, total_samples / sample_rate
+
+def _rms_db(frames):
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    return (20 * np.log10(np.maximum(rms, 1e-10))).astype(np.float32)
+
+@tracing.traced
+def find_silences(levels, duration, db_threshold, min_silence_length, frame_duration=ENVELOPE_FRAME_DURATION):
+    """
+    Finds runs of envelope frames quieter than db_threshold lasting at least min_silence_length seconds.
+
+    Returns:
+        list: [start, end] pairs in seconds, sorted and non-overlapping.
+    """
+    silent = np.concatenate(([False], levels < db_threshold, [False]))
+    edges = np.flatnonzero(np.diff(silent.astype(np.int8)))
+    starts = edges[0::2] * frame_duration
+    ends = np.minimum(edges[1::2] * frame_duration, duration)
+    long_enough = (ends - starts) >= min_silence_length
+    return [[float(start), float(end)] for start, end in zip(starts[long_enough], ends[long_enough])]
+
+@tracing.traced
+def load_loudness_envelope(input_file, digest=None, on_progress=None):
+    """
+    Returns the loudness envelope of the input, reading it from the envelope index when possible.
+
+    The index keeps one .npy file of per-frame dB levels for every input content hash, loaded
+    memory-mapped, so silences for any threshold or minimum length come from it without a decode.
+
+    Args:
+        input_file (str): Path to the input video file.
+        digest (str): cache.content_hash of the input, or None to skip the index entirely.
+        on_progress (callable): Passed to compute_loudness_envelope when the input has to be decoded.
+
+    Returns:
+        tuple: (levels, duration) as returned by compute_loudness_envelope.
+    """
+    if digest is None:
+        return compute_loudness_envelope(input_file, on_progress=on_progress)
+
+    key = cache.params_key(digest, ENVELOPE_SAMPLE_RATE, ENVELOPE_FRAME_DURATION)
+    directory = cache.cache_dir("envelopes")
+    array_path = os.path.join(directory, f"{key}.npy")
+    meta = cache.load_json("envelopes", key)
+    if meta is not None:
         try:
-            if "silence_start" in line:
-                start = float(line.split("silence_start: ")[1])
-                silence_parts.append([max(0, start + buffer_duration), None])
-            elif "silence_end" in line:
-                end = float(line.split("silence_end: ")[1].split()[0])
-                silence_duration = float(line.split("silence_duration: ")[1])
-                if silence_duration >= min_silence_length:
-                    silence_parts[-1][1] = end - buffer_duration
-                else:
-                    silence_parts.pop()  # Remove the last silence part if it's too short
-        except (IndexError, ValueError) as e:
-            print(f"Error parsing FFmpeg output line: {line}")
-            print(f"Error details: {e}")
+            levels = np.load(array_path, mmap_mode='r')
+            os.utime(array_path)
+            return levels, meta["duration"]
+        except (OSError, ValueError):
+            pass  # the array was evicted or damaged, rebuild it
+
+    levels, duration = compute_loudness_envelope(input_file, on_progress=on_progress)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, levels)
+    os.replace(temp_path, array_path)
+    cache.save_json("envelopes", key, {"duration": duration}, ENVELOPE_CACHE_MAX_BYTES)
+    return levels, duration
+
+def detect_raw_silences(input_file, db_threshold, min_silence_length, use_cache=True, on_progress=None):
+    """
+    Detects silences across the whole input before any buffer is applied.
+
+    Results are cached on disk, keyed by a content hash of the input plus the detection parameters,
+    so reruns that only change the buffer or the output path skip detection entirely. New parameter
+    combinations are computed from the envelope index, so only the first run on an input decodes it.
+
+    Returns:
+        tuple: (silences, duration) where silences are raw [start, end] pairs in source time.
+    """
+    digest = cache.content_hash(input_file) if use_cache else None
+    if use_cache:
+        key = cache.params_key(digest, db_threshold, min_silence_length, ENVELOPE_SAMPLE_RATE, ENVELOPE_FRAME_DURATION)
+        cached = cache.load_json("silence_maps", key)
+        if cached is not None:
+            print("Using cached silence map")
+            return cached["silences"], cached["duration"]
+
+    levels, duration = load_loudness_envelope(input_file, digest, on_progress)
+    silences = find_silences(levels, duration, db_threshold, min_silence_length)
+
+    if use_cache:
+        cache.save_json("silence_maps", key, {"silences": silences, "duration": duration}, SILENCE_CACHE_MAX_BYTES)
+    return silences, duration
+
+@tracing.traced
+def detect_silence(input_file, db_threshold, buffer_duration, min_silence_length, use_cache=True, on_progress=None):
+    """
+    Detects silences across the whole input with a single audio-only decode.
+    on_progress, if given, is called with the number of seconds decoded so far.
+
+    Returns:
+        tuple: (silence_parts, duration) where silence_parts are [start, end] pairs in source time
+               shrunk by buffer_duration on both sides, and duration is the audio duration in seconds.
+    """
+    silences, duration = detect_raw_silences(input_file, db_threshold, min_silence_length, use_cache, on_progress)
+    return merge_intervals(apply_buffer(silences, buffer_duration)), duration
+
+def detection_reporter(input_file, progress_callback):
+    """
+    Turns the seconds decoded by detection into 'detect' ProgressEvents. The container duration
+    comes from probe; if it cannot be read the events carry no fraction until detection finishes.
+    """
+    report = stage_reporter(progress_callback, "detect")
+    if report is None:
+        return None
+    total = probe.get_duration_or_none(input_file)
+
+    def on_progress(decoded):
+        if total:
+            report(min(decoded, total), total)
+    return on_progress
+
+def merge_intervals(intervals):
+    """
+    Sorts [start, end] intervals and merges any that overlap or touch, giving the single
+    global silence map that rendering and timestamp adjustment both work from.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+def apply_buffer(silences, buffer_duration):
+    """
+    Shrinks raw silences by buffer_duration on both sides so the fade in and out of speech is kept.
+    """
+    silence_parts = []
+    for start, end in silences:
+        start, end = max(0, start + buffer_duration), end - buffer_duration
+        # Silences no longer than two buffers vanish entirely once both buffers are kept
+        if end > start:
+            silence_parts.append([start, end])
+    return silence_parts
+
+@tracing.traced
+def sweep_thresholds(input_file, db_thresholds, buffer_duration, min_silence_length, use_cache=True):
+    """
+    Evaluates several decibel thresholds against a single loudness envelope.
+
+    Returns:
+        list: (db_threshold, silence_count, removed_duration) for every threshold, in the given order.
+    """
+    digest = cache.content_hash(input_file) if use_cache else None
+    levels, duration = load_loudness_envelope(input_file, digest)
+    results = []
+    for db_threshold in db_thresholds:
+        silence_parts = apply_buffer(find_silences(levels, duration, db_threshold, min_silence_length), buffer_duration)
+        removed = sum(end - start for start, end in silence_parts)
+        results.append((db_threshold, len(silence_parts), removed))
+    return results
+
+def chunk_silence_parts(silence_intervals, chunk_start, chunk_end):
+    """
+    Clips source-time silence intervals to a single chunk and shifts them into chunk-local time.
+    """
+    silence_parts = []
+    for start, end in silence_intervals:
+        start, end = max(start, chunk_start), min(end, chunk_end)
+        if end > start:
+            silence_parts.append([start - chunk_start, end - chunk_start])
+    return silence_parts
+
+def encoder_threads(jobs):
+    """
+    Splits the machine's cores between parallel encodes so N ffmpeg processes don't oversubscribe the CPU.
+    Returns None for a single job, which leaves ffmpeg's own thread auto-detection in charge.
+    """
+    if jobs <= 1:
+        return None
+    return max(1, (os.cpu_count() or 1) // jobs)
+
+def load_manifest(manifest_file):
+    """
+    Returns the job manifest stored in manifest_file, or None if there is none or it is unreadable.
+    """
+    try:
+        with open(manifest_file, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+def save_manifest(manifest_file, manifest):
+    """
+    Writes the job manifest atomically, so a run killed mid-write leaves the previous version intact.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(manifest_file), suffix=".tmp")
+    with os.fdopen(fd, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, manifest_file)
+
+def verified_chunks(completed, temp_dir):
+    """
+    Keeps the manifest's completed chunks whose output still exists with the recorded content hash.
+    Fully silent chunks never had an output and are always kept.
+    """
+    verified = {}
+    for index, entry in completed.items():
+        if entry.get("file") is None:
+            verified[index] = entry
             continue
+        path = os.path.join(temp_dir, entry["file"])
+        if os.path.exists(path) and cache.content_hash(path) == entry.get("hash"):
+            verified[index] = entry
+    return verified
+
+@tracing.traced
+def render_chunks(tasks, jobs=1, on_progress=None, on_chunk_done=None):
+    """
+    Runs cut_silence for every (input_file, silence_parts, chunk_duration, output_chunk, chunk_start) task,
+    in a process pool when jobs > 1. Returns the removed silence duration of each chunk in task order.
+
+    on_progress, if given, is called with (seconds rendered, total seconds) of source time and
+    replaces the tqdm bar. Serial renders report inside every chunk from ffmpeg's own progress,
+    parallel ones as each chunk finishes. on_chunk_done, if given, is called with the task index
+    of every chunk and the peak RSS in bytes of its encoder (None if unknown) as soon as it has been written.
+    """
+    threads = encoder_threads(jobs)
+    total = sum(task[2] for task in tasks)
+    bar = tqdm(total=total, desc="Processing chunks", unit="s", bar_format="{l_bar}{bar}| {n:.0f}/{total:.0f}s [{elapsed}<{remaining}]", disable=on_progress is not None)
+
+    def advance(position):
+        bar.update(position - bar.n)
+        if on_progress:
+            on_progress(position, total)
 
-    # Get the duration of the chunk
-    duration = float(subprocess.check_output(f"ffprobe -v error -show_entries format=duration -of default=noprint_wrappers=1:nokey=1 {input_chunk}", shell=True).decode().strip())
+    done = 0.0
+    with bar:
+        if jobs <= 1:
+            results = []
+            for task in tasks:
+                chunk_len = task[2]
+                result, peak_rss = cut_silence_measured(*task, on_progress=lambda progress, start=done, length=chunk_len: advance(start + (progress.fraction or 0.0) * length))
+                results.append(result)
+                if on_chunk_done:
+                    on_chunk_done(len(results) - 1, peak_rss)
+                done += chunk_len
+                advance(done)
+            return results
 
-    return silence_parts, duration
+        # Workers record their own spans when tracing, and hand them back with each chunk's result
+        trace = tracing.is_enabled()
+        results = [None] * len(tasks)
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                (executor.submit(tracing.run_collected, cut_silence_measured, *task, threads) if trace else executor.submit(cut_silence_measured, *task, threads)): i
+                for i, task in enumerate(tasks)
+            }
+            finished = set()
 
-def cut_silence(input_chunk, silence_parts, chunk_duration, output_chunk):
+            def finish(future):
+                nonlocal done
+                result = future.result()
+                if trace:
+                    result, spans = result
+                    tracing.add_spans(spans)
+                results[futures[future]], peak_rss = result
+                finished.add(future)
+                if on_chunk_done:
+                    on_chunk_done(futures[future], peak_rss)
+                done += tasks[futures[future]][2]
+                advance(done)
+
+            try:
+                for future in as_completed(futures):
+                    finish(future)  # surface the first failure right away
+            except BaseException:
+                # Drop the chunks that haven't started and let the running ones end, then report every
+                # chunk that did render, so a resumed run doesn't render it again
+                executor.shutdown(wait=True, cancel_futures=True)
+                for future in futures:
+                    if future not in finished and future.done() and not future.cancelled() and future.exception() is None:
+                        finish(future)
+                raise
+        return results
+
+def compute_keep_parts(silence_parts, duration):
+    """
+    Inverts a sorted list of silence parts into the [start, end] parts that should be kept.
+    """
     if not silence_parts:
-        shutil.copy(input_chunk, output_chunk)
-        return 0
+        return [[0, duration]]
 
-    # Generate a list of parts to keep
     keep_parts = []
     if silence_parts[0][0] > 0:
         keep_parts.append([0, silence_parts[0][0]])
@@ -112,108 +731,173 @@ def cut_silence(input_chunk, silence_parts, chunk_duration, output_chunk):
         keep_parts.append([silence_parts[i][1], silence_parts[i+1][0]])
     
     # Check if there's non-silent content after the last silence part
-    if silence_parts[-1][1] < chunk_duration:
-        keep_parts.append([silence_parts[-1][1], chunk_duration])
+    if silence_parts[-1][1] < duration:
+        keep_parts.append([silence_parts[-1][1], duration])
+    return keep_parts
+
+@tracing.traced
+def cut_silence(input_file, silence_parts, chunk_duration, output_chunk, chunk_start=0, threads=None, on_progress=None):
+    """
+    Renders chunk_duration seconds of input_file starting at chunk_start with the chunk-local
+    silence_parts removed. The chunk is read with an input seek, so no chunk file needs to exist first.
+    on_progress, if given, receives the FFmpegProgress of the encode.
+    """
+    # Chunks without silence are still re-encoded so every processed chunk shares the same encoder settings
+    keep_parts = compute_keep_parts(silence_parts, chunk_duration)
 
     # Calculate total silence duration
     silence_duration = sum(end - start for start, end in silence_parts)
 
-    # If there are no parts to keep, it means the entire chunk is silent
+    # If there are no parts to keep, the entire chunk is silent and produces no output file
     if not keep_parts:
-        # Create a short (e.g., 0.1 second) silent video
-        cmd = f"ffmpeg -f lavfi -i anullsrc=channel_layout=stereo:sample_rate=44100 -f lavfi -i color=c=black:s=1280x720:r=30 -t 0.1 -c:a aac -c:v libx264 {output_chunk}"
-        subprocess.run(cmd, shell=True, check=True)
         return silence_duration
 
-    # Generate filter complex string
-    filter_complex = ""
-    for i, (start, end) in enumerate(keep_parts):
-        filter_complex += f"[0:v]trim=start={start}:end={end},setpts=PTS-STARTPTS[v{i}];"
-        filter_complex += f"[0:a]atrim=start={start}:end={end},asetpts=PTS-STARTPTS[a{i}];"
-    
-    filter_complex += "".join(f"[v{i}][a{i}]" for i in range(len(keep_parts)))
-    filter_complex += f"concat=n={len(keep_parts)}:v=1:a=1[outv][outa]"
-    
-    cmd = f'ffmpeg -i "{input_chunk}" -filter_complex "{filter_complex}" -map "[outv]" -map "[outa]" {output_chunk}'
-    subprocess.run(cmd, shell=True, check=True)
+    # Kept parts are snapped to the source's frame grid, so every part holds whole frames and the
+    # audio kept with it covers exactly the same span
+    fps = source_frame_rate(input_file)
+    if fps:
+        keep_parts = snap_to_frames(keep_parts, chunk_start, chunk_duration, fps)
+        silence_duration = chunk_duration - sum(end - start for start, end in keep_parts)
+        if not keep_parts:
+            return silence_duration
+
+    # A single select/aselect pair keeps the graph the same size however many parts are kept.
+    # Both use the same half-open test, so a frame sitting exactly on a part's end is dropped.
+    keep_expr = "+".join(
+        f"gte(t,{start - SELECT_TOLERANCE:.6f})*lt(t,{end - SELECT_TOLERANCE:.6f})" for start, end in keep_parts
+    )
+    # Kept frames and samples are restamped by shifting each part back by the silence removed before
+    # it, which closes the gaps without assuming a constant frame rate. aresample then fills or trims
+    # the few samples by which whole audio frames overshoot a part, so the audio stays on those stamps.
+    removed_expr = "+".join(
+        f"gte(T,{start - SELECT_TOLERANCE:.6f})*{start - previous_end:.6f}"
+        for (start, _), previous_end in zip(keep_parts, [0.0] + [end for _, end in keep_parts[:-1]])
+        if start - previous_end > 0
+    ) or "0"
+    filter_complex = (
+        f"[0:v]select='{keep_expr}',setpts='(T-({removed_expr}))/TB'[outv];"
+        f"[0:a]asetnsamples=n={SELECT_AUDIO_FRAME_SAMPLES},aselect='{keep_expr}',"
+        f"asetpts='(T-({removed_expr}))/TB',aresample=async=1:min_hard_comp=0.001:first_pts=0[outa]"
+    )
+
+    # The expression grows with the number of cuts, so it is passed as a script file rather than an argument
+    filter_script = f"{output_chunk}.filter"
+    with open(filter_script, 'w') as f:
+        f.write(filter_complex)
+
+    thread_args = ['-threads', str(threads)] if threads else []
+    cmd = ['ffmpeg'] + thread_args + [
+        '-ss', f"{chunk_start:.6f}", '-t', f"{chunk_duration:.6f}", '-i', input_file,
+        '-filter_complex_script', filter_script,
+        '-map', '[outv]', '-map', '[outa]',
+        # Keep the restamped frame times as they are instead of resampling them to a constant rate
+        '-fps_mode', 'passthrough'
+    ] + CHUNK_ENCODE_ARGS + thread_args + ['-y', output_chunk]
+    run_ffmpeg(cmd, chunk_duration - silence_duration, on_progress)
 
     return silence_duration
 
-def concatenate_chunks(chunk_list, output_file):
+def source_frame_rate(input_file):
+    """
+    Returns the nominal frame rate of the input's first video stream, or None if it can't be probed.
+    """
+    try:
+        numerator, _, denominator = probe.get_stream(input_file, "video")["r_frame_rate"].partition('/')
+        fps = float(numerator) / float(denominator or 1)
+    except (subprocess.CalledProcessError, OSError, TypeError, KeyError, ValueError, ZeroDivisionError):
+        return None
+    return fps if fps > 0 else None
+
+def snap_to_frames(keep_parts, chunk_start, chunk_duration, fps):
+    """
+    Moves the chunk-local keep_parts boundaries to the nearest frame time of the source and drops
+    parts that end up empty.
+    """
+    snapped = []
+    for start, end in keep_parts:
+        start = min(max(round((chunk_start + start) * fps) / fps - chunk_start, 0.0), chunk_duration)
+        end = min(max(round((chunk_start + end) * fps) / fps - chunk_start, 0.0), chunk_duration)
+        if end > start:
+            snapped.append([start, end])
+    return snapped
+
+def cut_silence_measured(*args, **kwargs):
+    """
+    Runs cut_silence and returns (removed silence duration, peak RSS in bytes of its ffmpeg run).
+    The peak is None for fully silent chunks and where the OS doesn't report it.
+    """
+    tracing.last_child_max_rss()  # drop anything an earlier run on this thread left behind
+    result = cut_silence(*args, **kwargs)
+    return result, tracing.last_child_max_rss()
+
+@tracing.traced
+def concatenate_chunks(chunk_list, output_file, duration=None, on_progress=None):
+    """
+    Joins the processed chunks by stream copy. duration is the expected output length, which
+    drives the progress reports sent to on_progress, or the tqdm bar when there is no callback.
+    """
     print('Beginning final trimmed chunk concatenation')
-    input_args = []
-    for chunk in chunk_list:
-        input_args.extend(['-i', chunk])
-    
-    filter_complex = ''.join(f'[{i}:v][{i}:a]' for i in range(len(chunk_list))) + \
-                     f'concat=n={len(chunk_list)}:v=1:a=1[outv][outa]'
-    
-    cmd = ['ffmpeg'] + input_args + [
-        '-filter_complex', filter_complex,
-        '-map', '[outv]', '-map', '[outa]',
-        '-c:v', 'libx264', '-c:a', 'aac',
-        output_file
+    if not chunk_list:
+        raise ValueError("Every chunk was silent, there is nothing to concatenate")
+
+    # Chunks share CHUNK_ENCODE_ARGS, so the concat demuxer can join them without re-encoding
+    list_file = os.path.join(os.path.dirname(chunk_list[0]), "concat_list.txt")
+    with open(list_file, 'w') as f:
+        for chunk in chunk_list:
+            f.write(f"file '{os.path.abspath(chunk)}'\n")
+
+    cmd = [
+        'ffmpeg',
+        '-f', 'concat', '-safe', '0',
+        '-i', list_file,
+        '-c', 'copy',
+        '-movflags', '+faststart',
+        '-y', output_file
     ]
     
     try:
-        subprocess.run(cmd, check=True, stderr=subprocess.PIPE, universal_newlines=True)
+        run_ffmpeg(cmd, duration, on_progress, desc=None if on_progress else "Joining chunks")
     except subprocess.CalledProcessError as e:
         print(f"Error during concatenation: {e}")
         print(f"FFmpeg error output: {e.stderr}")
         raise
 
+@tracing.traced
 def process_timestamps(input_file, output_file, silence_intervals):
-    adjusted_timestamps = []
-    timestamps_adjusted = 0
-
     try:
         with open(input_file, 'r') as f:
             lines = f.readlines()
 
-        for line in lines:
-            parts = line.strip().split(' ', 1)
-            if len(parts) != 2:
-                raise ValueError(f"Invalid timestamp format in line: {line}")
-
-            time_str, description = parts
-            time_parts = time_str.split(':')
-            if len(time_parts) not in (2, 3):
-                raise ValueError(f"Invalid time format in line: {line}")
-
-            if len(time_parts) == 2:
-                minutes, seconds = map(float, time_parts)
-                hours = 0
-            else:
-                hours, minutes, seconds = map(float, time_parts)
-
-            original_seconds = hours * 3600 + minutes * 60 + seconds
-            
-            # Calculate silence removed up to this timestamp
-            silence_removed = sum(min(end, original_seconds) - start 
-                                  for start, end in silence_intervals 
-                                  if start < original_seconds)
-            
-            adjusted_seconds = max(0, original_seconds - silence_removed)
-            
-            adjusted_time = timedelta(seconds=adjusted_seconds)
-            adjusted_time_str = f"{int(adjusted_time.total_seconds() // 3600):02d}:{int((adjusted_time.total_seconds() % 3600) // 60):02d}:{adjusted_time.total_seconds() % 60:06.3f}"
-            adjusted_time_str = adjusted_time_str[:-4]
-            if adjusted_time.total_seconds() < 3600:
-                adjusted_time_str = adjusted_time_str[3:]  # Remove leading zeros for times less than an hour
-            
-            adjusted_timestamps.append(f"{adjusted_time_str} {description}")
-            timestamps_adjusted += 1
+        adjusted_timestamps = adjust_timestamps(lines, silence_intervals)
 
         with open(output_file, 'w') as f:
             for timestamp in adjusted_timestamps:
                 f.write(f"{timestamp}\n")
 
-        print(f"Adjusted {timestamps_adjusted} timestamps")
+        print(f"Adjusted {len(adjusted_timestamps)} timestamps")
 
     except Exception as e:
         print(f"Error processing timestamps: {e}")
         raise
 
+def adjust_timestamps(lines, silence_intervals):
+    timemap = TimeMap(silence_intervals)
+    adjusted_timestamps = []
+    for line in lines:
+        parts = line.strip().split(' ', 1)
+        if len(parts) != 2:
+            raise ValueError(f"Invalid timestamp format in line: {line}")
+
+        time_str, description = parts
+        original_seconds = parse_timestamp(time_str)
+        adjusted_timestamps.append(f"{format_timestamp(timemap.map(original_seconds))} {description}")
+    return adjusted_timestamps
+
+@tracing.traced
+def process_captions(input_file, output_file, silence_intervals):
+    cues = remap_captions(input_file, output_file, TimeMap(silence_intervals))
+    print(f"Adjusted {cues} captions")
+
 def check_silence_intervals(silence_intervals, buffer_duration):
     for i, (start, end) in enumerate(silence_intervals):
         if end - start < buffer_duration:  # Check for very short intervals (less than 10ms)
@@ -231,24 +915,65 @@ def debug_check_silence_removal(silence_intervals, cumulative_silence_removal):
         print(f"Total from cumulative: {total_from_cumulative:.3f}")
         print(f"Difference: {abs(total_from_intervals - total_from_cumulative):.3f}")
 
+def parse_chunk_duration(value):
+    if value.lower() == "auto":
+        return "auto"
+    try:
+        chunk_duration = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid chunk duration: {value}, expected seconds or 'auto'")
+    if chunk_duration <= 0:
+        raise argparse.ArgumentTypeError("Chunk duration must be positive")
+    return chunk_duration
+
 def main():
     parser = argparse.ArgumentParser(description="Remove silence from video files and adjust timestamps.")
     parser.add_argument("input_file", help="Path to the input video file")
     parser.add_argument("-o", "--output_file", help="Path to the output video file")
     parser.add_argument("-d", "--db_threshold", type=float, default=-45, help="Decibel threshold for silence detection. Default -45, raise to remove louder portions")
     parser.add_argument("-b", "--buffer_duration", type=float, default=0.2, help="Buffer duration around non-silent parts. Default 0.1 seconds")
-    parser.add_argument("-c", "--chunk_duration", type=int, default=150, help="Duration of video chunks to work with. Default 150 seconds")
-    parser.add_argument("-m", "--min_silence_factor", type=float, default=0.6, help="Minimum silence duration required in order for it to be cut out. Default 0.4 seconds, must be greater than or equal to buffer duration")
+    parser.add_argument("-c", "--chunk_duration", type=parse_chunk_duration, default=150, help="Duration of video chunks to work with in seconds, or 'auto' to pick the longest chunks that fit in memory for the input's resolution, cut density and --jobs. Default 150 seconds")
+    parser.add_argument("-m", "--min_silence_factor", type=float, default=0.6, help="Minimum silence duration required in order for it to be cut out. Default 0.6 seconds, must be more than twice the buffer duration")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Number of chunks to process in parallel. Default 1; encoder threads are split evenly between jobs")
+    parser.add_argument("-r", "--render-mode", choices=["reencode", "smart"], default="reencode", help="'reencode' re-encodes every kept frame. 'smart' stream-copies whole GOPs and re-encodes only the cut boundaries (H.264 sources only)")
+    parser.add_argument("--no-cache", action="store_true", help="Always decode the input instead of reusing a cached silence map")
+    parser.add_argument("--sweep", type=float, nargs="+", metavar="DB", help="Only report how much each of these decibel thresholds would remove, computed from the cached loudness envelope")
+    parser.add_argument("--plan-only", action="store_true", help="Only detect silences: print what would be removed and write the cut list as JSON, without encoding any video")
+    parser.add_argument("--cut-list", help="Path of the JSON cut list written by --plan-only. Defaults to {input}_cuts.json")
+    parser.add_argument("--work-dir", help="Directory in which this run creates its private scratch directory, ideally on a fast disk with room for about the input's size. Defaults to $AVES_SCRATCH_DIR or the system temp directory")
+    parser.add_argument("--resume", action="store_true", help="Keep finished chunks if the run fails and reuse them when the same command is run again (reencode mode)")
+    parser.add_argument("--trace", metavar="TRACE_JSON", help="Record timing spans for every stage and ffmpeg run and save them in Chrome trace format")
     parser.add_argument("-t", "--timestamps", help="Path to the input timestamps file")
     parser.add_argument("--output_timestamps", help="Path to the output adjusted timestamps file")
+    parser.add_argument("--captions", help="Path to an input .srt or .vtt captions file to adjust")
+    parser.add_argument("--output_captions", help="Path to the output adjusted captions file")
     
     args = parser.parse_args()
-    
+
+    if args.trace:
+        tracing.enable()
+    try:
+        run(args)
+    finally:
+        if args.trace:
+            tracing.write_chrome_trace(args.trace)
+
+def run(args):
+    if args.sweep:
+        for db_threshold, count, removed in sweep_thresholds(args.input_file, args.sweep, args.buffer_duration, args.min_silence_factor, not args.no_cache):
+            print(f"{db_threshold:7.1f} dB: {count} silences, {timedelta(seconds=removed)} removed")
+        return
+
+    if args.plan_only:
+        cut_list_file = args.cut_list or f"{os.path.splitext(args.input_file)[0]}_cuts.json"
+        plan_video(args.input_file, cut_list_file, args.db_threshold, args.buffer_duration, args.min_silence_factor, args.timestamps, not args.no_cache)
+        return
+
     if not args.output_file:
         base, ext = os.path.splitext(args.input_file)
         args.output_file = f"{base}_no_silence{ext}"
     
-    process_video(args.input_file, args.output_file, args.chunk_duration, args.db_threshold, args.buffer_duration, args.timestamps, args.output_timestamps)
+    process_video(args.input_file, args.output_file, args.chunk_duration, args.db_threshold, args.buffer_duration, args.timestamps, args.output_timestamps, args.jobs, args.render_mode, args.min_silence_factor, not args.no_cache, args.captions, args.output_captions, args.work_dir, resume=args.resume)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
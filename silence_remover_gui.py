@@ -1,29 +1,41 @@
 import sys
 import os
-import subprocess
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog, QLabel, QSpinBox, QDoubleSpinBox, QLineEdit, QTextEdit
+from datetime import timedelta
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog, QLabel, QSpinBox, QDoubleSpinBox, QLineEdit, QTextEdit, QProgressBar
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from silence_remover import process_video, sweep_thresholds
 
 class ProcessThread(QThread):
-    finished = pyqtSignal()
+    finished = pyqtSignal(object)  # SilenceRemovalResult
     error = pyqtSignal(str)
-    output = pyqtSignal(str)
+    progress = pyqtSignal(object)  # ProgressEvent
 
-    def __init__(self, command):
+    def __init__(self, kwargs):
         QThread.__init__(self)
-        self.command = command
+        self.kwargs = kwargs
 
     def run(self):
         try:
-            process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1, universal_newlines=True)
-            for line in iter(process.stdout.readline, ''):
-                self.output.emit(line.strip())
-            process.stdout.close()
-            return_code = process.wait()
-            if return_code != 0:
-                self.error.emit(f"Process exited with return code {return_code}")
-            else:
-                self.finished.emit()
+            result = process_video(progress_callback=self.progress.emit, **self.kwargs)
+            self.finished.emit(result)
+        except Exception as e:
+            self.error.emit(str(e))
+
+class PreviewThread(QThread):
+    result = pyqtSignal(list)
+    error = pyqtSignal(str)
+
+    def __init__(self, input_file, db_thresholds, buffer_duration, min_silence_length):
+        QThread.__init__(self)
+        self.input_file = input_file
+        self.db_thresholds = db_thresholds
+        self.buffer_duration = buffer_duration
+        self.min_silence_length = min_silence_length
+
+    def run(self):
+        try:
+            # Only the first preview of a file decodes it, later ones read the cached loudness envelope
+            self.result.emit(sweep_thresholds(self.input_file, self.db_thresholds, self.buffer_duration, self.min_silence_length))
         except Exception as e:
             self.error.emit(str(e))
 
@@ -76,7 +88,8 @@ class SilenceRemoverGUI(QWidget):
         chunkLayout = QHBoxLayout()
         chunkLayout.addWidget(QLabel('Chunk Duration (s):'))
         self.chunkDuration = QSpinBox()
-        self.chunkDuration.setRange(1, 3600)
+        self.chunkDuration.setRange(0, 3600)
+        self.chunkDuration.setSpecialValueText('Auto')  # 0 lets the remover size chunks from free memory
         self.chunkDuration.setValue(150)
         chunkLayout.addWidget(self.chunkDuration)
         paramLayout.addLayout(chunkLayout)
@@ -107,11 +120,20 @@ class SilenceRemoverGUI(QWidget):
         layout.addWidget(self.outputTimestampsFileButton)
         layout.addWidget(self.outputTimestampsFileLabel)
 
+        # Preview button
+        self.previewButton = QPushButton('Preview Silence Removal')
+        self.previewButton.clicked.connect(self.previewVideo)
+        layout.addWidget(self.previewButton)
+
         # Process button
         self.processButton = QPushButton('Process Video')
         self.processButton.clicked.connect(self.processVideo)
         layout.addWidget(self.processButton)
 
+        # Progress bar
+        self.progressBar = QProgressBar()
+        layout.addWidget(self.progressBar)
+
         # Status label
         self.statusLabel = QLabel('Ready')
         layout.addWidget(self.statusLabel)
@@ -146,12 +168,39 @@ class SilenceRemoverGUI(QWidget):
         if filename:
             self.outputTimestampsFileLabel.setText(filename)
 
+    def previewVideo(self):
+        input_file = self.inputFileLabel.text()
+        if input_file == 'No file selected':
+            self.statusLabel.setText("Please select an input file")
+            return
+
+        # Show the chosen threshold alongside its neighbours so it can be tuned without a render
+        db_threshold = self.dbThreshold.value()
+        db_thresholds = [db_threshold - 5, db_threshold, db_threshold + 5]
+
+        self.previewButton.setEnabled(False)
+        self.statusLabel.setText("Analysing audio...")
+        self.previewThread = PreviewThread(input_file, db_thresholds, self.bufferDuration.value(), self.minSilenceFactor.value())
+        self.previewThread.result.connect(self.onPreviewFinished)
+        self.previewThread.error.connect(self.onPreviewError)
+        self.previewThread.start()
+
+    def onPreviewFinished(self, results):
+        for db_threshold, count, removed in results:
+            self.updateTerminalOutput(f"{db_threshold:.1f} dB: {count} silences, {timedelta(seconds=round(removed))} removed")
+        self.statusLabel.setText("Preview ready")
+        self.previewButton.setEnabled(True)
+
+    def onPreviewError(self, error_message):
+        self.statusLabel.setText(f"Error: {error_message}")
+        self.previewButton.setEnabled(True)
+
     def processVideo(self):
         input_file = self.inputFileLabel.text()
         output_file = self.outputFileLabel.text()
         db_threshold = self.dbThreshold.value()
         buffer_duration = self.bufferDuration.value()
-        chunk_duration = self.chunkDuration.value()
+        chunk_duration = self.chunkDuration.value() or 'auto'
         min_silence_factor = self.minSilenceFactor.value()
         timestamps_file = self.timestampsFileLabel.text()
         output_timestamps_file = self.outputTimestampsFileLabel.text()
@@ -168,34 +217,45 @@ class SilenceRemoverGUI(QWidget):
         self.processButton.setEnabled(False)
         self.statusLabel.setText("Processing...")
 
-        # Prepare the command
-        command = [
-            'python', 'silence_remover.py',
-            input_file,
-            '-o', output_file,
-            '-d', str(db_threshold),
-            '-b', str(buffer_duration),
-            '-c', str(chunk_duration),
-            '-m', str(min_silence_factor)
-        ]
+        kwargs = {
+            'input_file': input_file,
+            'output_file': output_file,
+            'chunk_duration': chunk_duration,
+            'db_threshold': db_threshold,
+            'buffer_duration': buffer_duration,
+            'min_silence_length': min_silence_factor,
+        }
 
         if timestamps_file != 'No file selected':
-            command.extend(['-t', timestamps_file])
+            kwargs['timestamps_file'] = timestamps_file
 
         if output_timestamps_file != 'No file selected':
-            command.extend(['--output_timestamps', output_timestamps_file])
+            kwargs['output_timestamps_file'] = output_timestamps_file
 
         # Clear previous output
         self.terminalOutput.clear()
+        self.progressBar.setValue(0)
 
         # Create and start the processing thread
-        self.thread = ProcessThread(command)
+        self.thread = ProcessThread(kwargs)
         self.thread.finished.connect(self.onProcessingFinished)
         self.thread.error.connect(self.onProcessingError)
-        self.thread.output.connect(self.updateTerminalOutput)
+        self.thread.progress.connect(self.updateProgress)
         self.thread.start()
 
-    def onProcessingFinished(self):
+    def updateProgress(self, event):
+        self.progressBar.setValue(int(event.overall * 100))
+        status = f"Processing: {event.stage} {event.fraction:.0%}"
+        if event.eta is not None:
+            status += f" ({timedelta(seconds=round(event.eta))} left in this stage)"
+        self.statusLabel.setText(status)
+
+    def onProcessingFinished(self, result):
+        self.progressBar.setValue(100)
+        self.updateTerminalOutput(f"Removed {len(result.silence_intervals)} silences, {timedelta(seconds=round(result.removed_duration))} in total")
+        self.updateTerminalOutput(f"Output saved to: {result.output_file}")
+        if result.output_timestamps_file:
+            self.updateTerminalOutput(f"Adjusted timestamps saved to: {result.output_timestamps_file}")
         self.statusLabel.setText("Processing completed successfully!")
         self.processButton.setEnabled(True)
 
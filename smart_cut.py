@@ -0,0 +1,224 @@
+"""
+smart_cut.py
+
+Keyframe-aware rendering of a list of kept parts. Any stretch of a kept part that runs from one
+keyframe to another is stream-copied, and only the partial GOPs at the cut boundaries are
+re-encoded. All pieces are written as MPEG-TS, so the x264 boundary pieces and the copied source
+pieces keep their own in-band parameter sets, and then spliced into one output with the concat demuxer.
+
+Only H.264 sources can be smart-cut, since the boundary pieces are encoded with libx264.
+"""
+
+import os
+import subprocess
+import threading
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+from tqdm import tqdm
+
+import cache
+import probe
+import tracing
+from ffmpeg_runner import run_ffmpeg
+
+# Keyframes closer than this to a cut point count as sitting exactly on it
+KEYFRAME_TOLERANCE = 0.001
+
+# Keyframe indexes are a few hundred KB for a long recording, this keeps hundreds of them
+KEYFRAME_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+# Audio is re-encoded in every piece so its timing stays sample accurate across the splices
+PIECE_AUDIO_ARGS = ['-c:a', 'aac', '-b:a', '192k']
+
+X264_PROFILES = {
+    "Constrained Baseline": "baseline",
+    "Baseline": "baseline",
+    "Main": "main",
+    "High": "high",
+}
+
+def get_video_stream_info(input_file):
+    """
+    Returns the parameters of the first video stream that boundary pieces must match.
+
+    Args:
+        input_file (str): Path to the input video file.
+
+    Returns:
+        dict: The ffprobe stream entry (codec_name, profile, pix_fmt, r_frame_rate, ...).
+    """
+    stream = probe.get_stream(input_file, "video")
+    if stream is None:
+        raise ValueError(f"No video stream found in {input_file}")
+    return stream
+
+def get_keyframe_index(input_file):
+    """
+    Returns the sorted presentation times of every video keyframe in the input.
+
+    The index comes from a packet-level ffprobe pass, which reads the container without
+    decoding. It is cached on disk, keyed by the file's path, size and modification time.
+
+    Args:
+        input_file (str): Path to the input video file.
+
+    Returns:
+        list: Keyframe times in seconds.
+    """
+    key = cache.file_key(input_file)
+    keyframes = cache.load_json("keyframes", key)
+    if keyframes is not None:
+        return keyframes
+
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=print_section=0",
+        input_file
+    ]
+    with tracing.span("ffprobe", "subprocess", cmd=" ".join(cmd)):
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    keyframes = []
+    for line in result.stdout.splitlines():
+        parts = line.split(',')
+        if len(parts) >= 2 and 'K' in parts[1] and parts[0] not in ('', 'N/A'):
+            keyframes.append(float(parts[0]))
+    keyframes.sort()
+
+    cache.save_json("keyframes", key, keyframes, KEYFRAME_CACHE_MAX_BYTES)
+    return keyframes
+
+@tracing.traced
+def plan_smart_cut(keep_parts, keyframes):
+    """
+    Splits every kept part into stream-copyable whole GOPs and re-encoded boundary pieces.
+
+    Args:
+        keep_parts (list): Sorted [start, end] parts of the source to keep, in seconds.
+        keyframes (list): Sorted keyframe times of the source.
+
+    Returns:
+        list: (mode, start, end) tuples in output order, where mode is 'copy' or 'encode'.
+    """
+    pieces = []
+    for start, end in keep_parts:
+        first = bisect_left(keyframes, start - KEYFRAME_TOLERANCE)
+        last = bisect_right(keyframes, end + KEYFRAME_TOLERANCE) - 1
+        if first < len(keyframes) and last > first:
+            copy_start, copy_end = keyframes[first], keyframes[last]
+            if copy_start - start > KEYFRAME_TOLERANCE:
+                pieces.append(('encode', start, copy_start))
+            pieces.append(('copy', copy_start, copy_end))
+            if end - copy_end > KEYFRAME_TOLERANCE:
+                pieces.append(('encode', copy_end, end))
+        else:
+            pieces.append(('encode', start, end))
+    return pieces
+
+def render_piece(input_file, piece, output_piece, stream_info, threads=None, on_progress=None):
+    """
+    Writes one planned piece of the source as an MPEG-TS file.
+
+    Args:
+        input_file (str): Path to the input video file.
+        piece (tuple): (mode, start, end) as produced by plan_smart_cut.
+        output_piece (str): Path of the .ts file to write.
+        stream_info (dict): Video stream parameters from get_video_stream_info.
+        threads (int): Encoder thread cap, or None to let ffmpeg decide.
+        on_progress (callable): Called with the FFmpegProgress of the piece's ffmpeg run.
+    """
+    mode, start, end = piece
+    thread_args = ['-threads', str(threads)] if threads else []
+    if mode == 'copy':
+        video_args = ['-c:v', 'copy']
+    else:
+        video_args = ['-c:v', 'libx264', '-preset', 'medium', '-crf', '18', '-pix_fmt', stream_info['pix_fmt'], '-r', stream_info['r_frame_rate']]
+        profile = X264_PROFILES.get(stream_info.get('profile'))
+        if profile:
+            video_args += ['-profile:v', profile]
+
+    cmd = ['ffmpeg', '-v', 'error'] + thread_args + [
+        '-ss', f"{start:.6f}",
+        '-i', input_file,
+        '-t', f"{end - start:.6f}",
+        '-map', '0:v:0', '-map', '0:a:0?'
+    ] + video_args + PIECE_AUDIO_ARGS + thread_args + [
+        '-avoid_negative_ts', 'make_zero',
+        '-f', 'mpegts', '-y', output_piece
+    ]
+    run_ffmpeg(cmd, end - start, on_progress)
+
+@tracing.traced
+def smart_cut(input_file, keep_parts, output_file, temp_dir, jobs=1, threads=None, on_progress=None):
+    """
+    Renders keep_parts of input_file into output_file, re-encoding only the partial GOPs at each cut.
+
+    Args:
+        input_file (str): Path to the input video file.
+        keep_parts (list): Sorted [start, end] parts of the source to keep, in seconds.
+        output_file (str): Path of the final video.
+        temp_dir (str): Directory for the intermediate pieces.
+        jobs (int): Number of pieces rendered at the same time.
+        threads (int): Encoder thread cap per piece, or None to let ffmpeg decide.
+        on_progress (callable): Called with (seconds rendered, total seconds) as the pieces render,
+                                replacing the tqdm bar. It may be called from worker threads.
+
+    Returns:
+        tuple: (copied_duration, encoded_duration) in seconds.
+    """
+    stream_info = get_video_stream_info(input_file)
+    if stream_info.get('codec_name') != 'h264':
+        raise ValueError(f"Smart cut needs an H.264 source, got {stream_info.get('codec_name')}")
+
+    pieces = plan_smart_cut(keep_parts, get_keyframe_index(input_file))
+    piece_files = [os.path.join(temp_dir, f"piece_{i:05d}.ts") for i in range(len(pieces))]
+
+    # Every piece reports how far its own ffmpeg run has got, and the sum drives the progress
+    total = sum(end - start for mode, start, end in pieces)
+    positions = [0.0] * len(pieces)
+    lock = threading.Lock()
+    bar = tqdm(total=total, desc="Rendering pieces", unit="s", bar_format="{l_bar}{bar}| {n:.0f}/{total:.0f}s [{elapsed}<{remaining}]", disable=on_progress is not None)
+
+    def advance(i, position):
+        with lock:
+            positions[i] = max(positions[i], position)
+            done = sum(positions)
+            bar.update(done - bar.n)
+            if on_progress:
+                on_progress(done, total)
+
+    def piece_reporter(i, length):
+        return lambda progress: advance(i, length if progress.done else min(progress.out_time, length))
+
+    with bar, ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = [
+            executor.submit(render_piece, input_file, piece, piece_file, stream_info, threads, piece_reporter(i, piece[2] - piece[1]))
+            for i, (piece, piece_file) in enumerate(zip(pieces, piece_files))
+        ]
+        for i, ((mode, start, end), future) in enumerate(zip(pieces, futures)):
+            future.result()
+            advance(i, end - start)
+
+    # Explicit durations stop encoder padding at the end of a piece from accumulating as drift
+    list_file = os.path.join(temp_dir, "pieces.txt")
+    with open(list_file, 'w') as f:
+        for (mode, start, end), piece_file in zip(pieces, piece_files):
+            f.write(f"file '{os.path.abspath(piece_file)}'\n")
+            f.write(f"duration {end - start:.6f}\n")
+
+    cmd = [
+        'ffmpeg', '-v', 'error',
+        '-f', 'concat', '-safe', '0',
+        '-i', list_file,
+        '-c', 'copy',
+        '-movflags', '+faststart',
+        '-y', output_file
+    ]
+    run_ffmpeg(cmd, total)
+
+    copied_duration = sum(end - start for mode, start, end in pieces if mode == 'copy')
+    encoded_duration = sum(end - start for mode, start, end in pieces if mode == 'encode')
+    return copied_duration, encoded_duration
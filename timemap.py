@@ -0,0 +1,142 @@
+"""
+timemap.py
+
+Maps times in a source video to times in an edited version of it, shared by the silence remover
+(which deletes intervals) and the concatenator (which shifts whole clips by an offset).
+
+A TimeMap keeps the removed intervals as sorted start/end arrays plus a prefix sum of their
+durations, so every lookup is a single bisect no matter how many cuts there are. The module also
+parses and formats YouTube-style timestamps and remaps SRT/VTT caption sidecars.
+"""
+
+import re
+from bisect import bisect_left
+
+CAPTION_TIME = re.compile(r"(?:(\d+):)?(\d{2}):(\d{2})[,.](\d{3})")
+CAPTION_TIMING_LINE = re.compile(r"^\s*(\S+)\s+-->\s+(\S+)(.*)$")
+
+class TimeMap:
+    def __init__(self, removed_intervals=(), offset=0.0):
+        """
+        removed_intervals: [start, end] pairs of source time that are cut out of the edit.
+        offset: Seconds added to every mapped time, e.g. where a clip begins in a concatenation.
+        """
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(removed_intervals):
+            if end <= start:
+                continue
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+        # removed_before[i] is the total duration of the first i removed intervals
+        self.removed_before = [0.0]
+        for start, end in zip(self.starts, self.ends):
+            self.removed_before.append(self.removed_before[-1] + end - start)
+        self.offset = offset
+
+    @property
+    def removed_duration(self):
+        return self.removed_before[-1]
+
+    def removed_until(self, t):
+        """
+        Returns how much source time before t has been cut out.
+        """
+        i = bisect_left(self.starts, t)
+        if i == 0:
+            return 0.0
+        return self.removed_before[i - 1] + min(self.ends[i - 1], t) - self.starts[i - 1]
+
+    def map(self, t):
+        """
+        Maps a source time to the edited timeline. Times inside a removed interval land on the cut.
+        """
+        return max(0.0, t - self.removed_until(t)) + self.offset
+
+def parse_timestamp(time_str):
+    """
+    Parses M:SS, MM:SS or H:MM:SS (seconds may be fractional) into seconds.
+
+    Raises:
+        ValueError: If the string is not a timestamp.
+    """
+    time_parts = time_str.split(':')
+    if len(time_parts) not in (2, 3):
+        raise ValueError(f"Invalid time format: {time_str}")
+    seconds = 0.0
+    for part in time_parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+def format_timestamp(seconds):
+    """
+    Formats seconds as MM:SS, or HH:MM:SS from one hour on, dropping fractions of a second.
+    """
+    total = int(seconds)
+    hours, remainder = divmod(total, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+def _parse_caption_time(time_str):
+    match = CAPTION_TIME.fullmatch(time_str)
+    if not match:
+        raise ValueError(f"Invalid caption time: {time_str}")
+    hours, minutes, seconds, millis = match.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
+
+def _format_caption_time(seconds, separator):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+def remap_captions(input_file, output_file, timemap):
+    """
+    Rewrites the cue timings of an SRT or WebVTT file through a TimeMap.
+    Cues that fall entirely inside removed time are dropped, and SRT cues are renumbered.
+
+    Returns:
+        int: Number of cues written.
+    """
+    is_vtt = input_file.lower().endswith('.vtt')
+    separator = '.' if is_vtt else ','
+    with open(input_file, 'r', encoding='utf-8-sig') as f:
+        blocks = re.split(r"\n\s*\n", f.read().replace('\r\n', '\n').strip())
+
+    output_blocks = []
+    cues_written = 0
+    for block in blocks:
+        lines = block.split('\n')
+        timing_index = next((i for i, line in enumerate(lines) if '-->' in line), None)
+        if timing_index is None:
+            # WEBVTT header, NOTE and STYLE blocks pass through untouched
+            output_blocks.append(block)
+            continue
+
+        match = CAPTION_TIMING_LINE.match(lines[timing_index])
+        if not match:
+            raise ValueError(f"Invalid caption timing line: {lines[timing_index]}")
+        start_str, end_str, settings = match.groups()
+        start = timemap.map(_parse_caption_time(start_str))
+        end = timemap.map(_parse_caption_time(end_str))
+        if end <= start:
+            continue
+
+        cues_written += 1
+        timing = f"{_format_caption_time(start, separator)} --> {_format_caption_time(end, separator)}{settings}"
+        if is_vtt:
+            lines[timing_index] = timing
+        else:
+            lines = [str(cues_written), timing] + lines[timing_index + 1:]
+        output_blocks.append('\n'.join(lines))
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write('\n\n'.join(output_blocks) + '\n')
+    return cues_written
@@ -0,0 +1,177 @@
+"""
+tracing.py
+
+Timing spans for finding out where a slow job spent its time. Tracing is off until enable() is
+called, and then every traced Python stage and every ffmpeg/ffprobe run records a span with its
+wall time and CPU time; subprocess spans also carry the command line and the child's peak RSS.
+write_chrome_trace() saves the spans in Chrome's trace-event format, which chrome://tracing and
+https://ui.perfetto.dev open as a timeline with one row per process and thread.
+
+Span timestamps come from the wall clock so spans recorded in pool worker processes line up with
+the parent's once they are merged with add_spans().
+"""
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows has no getrusage, spans there only carry wall and CPU time
+    resource = None
+
+_enabled = False
+_spans = []
+_lock = threading.Lock()
+_local = threading.local()
+
+def enable():
+    """
+    Starts recording spans in this process.
+    """
+    global _enabled
+    _enabled = True
+
+def is_enabled():
+    return _enabled
+
+def _max_rss_kb(ru_maxrss):
+    # Linux reports kilobytes, macOS bytes
+    return ru_maxrss // 1024 if sys.platform == "darwin" else ru_maxrss
+
+def _children_usage():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_CHILDREN)
+
+@contextmanager
+def span(name, category="python", **args):
+    """
+    Records the enclosed block as a span. Keyword arguments are stored with it.
+
+    Spans in the 'subprocess' category also record the CPU time and peak RSS of child processes.
+    The exact figures come from wait() when the caller owns the Popen. Otherwise they are the change
+    in RUSAGE_CHILDREN over the span, which also counts other children that finish meanwhile. Its
+    peak RSS is the high-water mark of every child so far.
+    """
+    if not _enabled:
+        yield
+        return
+
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    event = {"name": name, "cat": category, "args": dict(args)}
+    stack.append(event)
+    children_before = _children_usage() if category == "subprocess" else None
+    start_wall = time.time()
+    start = time.perf_counter()
+    start_cpu = time.thread_time()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        event["args"]["cpu_s"] = round(time.thread_time() - start_cpu, 6)
+        if children_before is not None and "child_cpu_s" not in event["args"]:
+            children_after = _children_usage()
+            event["args"]["child_cpu_s"] = round(
+                children_after.ru_utime + children_after.ru_stime - children_before.ru_utime - children_before.ru_stime, 6
+            )
+            event["args"]["child_max_rss_kb"] = _max_rss_kb(children_after.ru_maxrss)
+        stack.pop()
+        event.update({
+            "ph": "X",
+            "ts": int(start_wall * 1e6),
+            "dur": int(duration * 1e6),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        })
+        with _lock:
+            _spans.append(event)
+
+def annotate(**args):
+    """
+    Adds values to the innermost open span of this thread, if tracing is on.
+    """
+    stack = getattr(_local, "stack", None)
+    if _enabled and stack:
+        stack[-1]["args"].update(args)
+
+def wait(process):
+    """
+    Waits for a Popen process like process.wait(). Where os.wait4 exists the child is reaped with it,
+    so its own resource usage is known: last_child_max_rss() returns its peak RSS and, when tracing,
+    the current span gets its CPU time and peak RSS.
+    """
+    _local.last_max_rss = None
+    if not hasattr(os, "wait4") or not hasattr(os, "waitstatus_to_exitcode") or process.returncode is not None:
+        return process.wait()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    _local.last_max_rss = _max_rss_kb(usage.ru_maxrss) * 1024
+    annotate(
+        child_cpu_s=round(usage.ru_utime + usage.ru_stime, 6),
+        child_max_rss_kb=_max_rss_kb(usage.ru_maxrss),
+    )
+    return process.returncode
+
+def last_child_max_rss():
+    """
+    Returns the peak RSS in bytes of the child this thread last reaped with wait(), or None if it is
+    unknown or was already returned by an earlier call.
+    """
+    max_rss = getattr(_local, "last_max_rss", None)
+    _local.last_max_rss = None
+    return max_rss
+
+def traced(func):
+    """
+    Decorator recording every call of func as a span named after it.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        with span(func.__name__, "python"):
+            return func(*args, **kwargs)
+    return wrapper
+
+def run_collected(func, *args):
+    """
+    Runs func in a pool worker with tracing on and returns (result, spans), so the parent process
+    can merge the worker's spans with add_spans().
+    """
+    enable()
+    with _lock:
+        start = len(_spans)
+    result = func(*args)
+    with _lock:
+        spans = _spans[start:]
+        del _spans[start:]
+    return result, spans
+
+def add_spans(spans):
+    """
+    Merges spans recorded in another process.
+    """
+    with _lock:
+        _spans.extend(spans)
+
+def write_chrome_trace(output_file):
+    """
+    Writes every recorded span to output_file as a Chrome trace-event JSON document.
+    """
+    with _lock:
+        events = sorted(_spans, key=lambda event: event["ts"])
+    names = {os.getpid(): os.path.basename(sys.argv[0]) or "python"}
+    metadata = [
+        {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": names.get(pid, f"worker {pid}")}}
+        for pid in sorted({event["pid"] for event in events} | set(names))
+    ]
+    with open(output_file, 'w') as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+    print(f"Trace with {len(events)} spans saved to {output_file}")
@@ -8,6 +8,9 @@ Each crop definition should follow the format: name:x:y:width:height
 Example usage:
     python video_cropper.py /path/to/video.mp4 --crop "left:0:0:608:1080" --crop "middle:656:0:608:1080" --crop "right:1312:0:608:1080"
 
+Several videos can be cropped at the same time, with encoder threads split between them:
+    python video_cropper.py a.mp4 b.mp4 c.mp4 --workers 3 --crop "left:0:0:608:1080" --crop "right:1312:0:608:1080"
+
 Output files are saved in the same directory as the input video with names:
     {input_basename}_{crop_name}.mp4
 """
@@ -16,6 +19,13 @@ import argparse
 import os
 import sys
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from tqdm import tqdm
+
+import probe
+import tracing
+from ffmpeg_runner import run_ffmpeg, tqdm_callback
 
 def parse_crop_option(crop_str):
     """
@@ -53,21 +63,8 @@ def get_video_dimensions(input_file):
     Returns:
         tuple: (width, height) of the video.
     """
-    cmd = [
-        "ffprobe",
-        "-v", "error",
-        "-select_streams", "v:0",
-        "-show_entries", "stream=width,height",
-        "-of", "csv=s=x:p=0",
-        input_file
-    ]
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        output = result.stdout.strip()
-        if not output:
-            raise ValueError("Could not determine video dimensions.")
-        width, height = output.split("x")
-        return int(width), int(height)
+        return probe.get_video_dimensions(input_file)
     except subprocess.CalledProcessError as e:
         print(f"Error retrieving video dimensions: {e}", file=sys.stderr)
         sys.exit(1)
@@ -91,86 +88,222 @@ def get_output_file(input_file, crop_name):
     output_filename = f"{base}_{crop_name}.mp4"
     return os.path.join(directory, output_filename)
 
-def process_crop(input_file, crop):
+def build_crop_command(input_file, crops, threads=None):
     """
-    Processes a single crop by invoking ffmpeg with the appropriate crop filter.
+    Builds a single ffmpeg command that decodes the input once and writes every crop.
+    The decoded video is split into one crop branch per definition, each mapped to its own output.
     
     Args:
         input_file (str): Path to the input video file.
-        crop (dict): Crop definition containing 'x', 'y', 'width', 'height', and 'name'.
+        crops (list): Crop definitions containing 'x', 'y', 'width', 'height', and 'name'.
+        threads (int): Encoder thread cap per output, or None to let ffmpeg decide.
         
     Returns:
-        bool: True if the crop was processed successfully, False otherwise.
+        list: The ffmpeg command.
     """
-    output_file = get_output_file(input_file, crop["name"])
-    crop_filter = f"crop={crop['width']}:{crop['height']}:{crop['x']}:{crop['y']}"
+    if len(crops) == 1:
+        branches = ["[0:v]"]
+        filter_complex = ""
+    else:
+        branches = [f"[s{i}]" for i in range(len(crops))]
+        filter_complex = f"[0:v]split={len(crops)}{''.join(branches)};"
+    filter_complex += ";".join(
+        f"{branch}crop={crop['width']}:{crop['height']}:{crop['x']}:{crop['y']}[v{i}]"
+        for i, (branch, crop) in enumerate(zip(branches, crops))
+    )
+
     cmd = [
         "ffmpeg",
+        "-y",  # Overwrite if output exists
         "-i", input_file,
-        "-filter:v", crop_filter,
-        "-c:v", "libx264",
-        "-preset", "fast",
-        "-crf", "23",
-        "-c:a", "copy",
-        output_file,
-        "-y"  # Overwrite if output exists
+        "-filter_complex", filter_complex
     ]
-    print(f"Processing crop '{crop['name']}' with filter: {crop_filter}")
+    for i, crop in enumerate(crops):
+        cmd += [
+            "-map", f"[v{i}]",
+            "-map", "0:a?",
+            "-c:v", "libx264",
+            "-preset", "fast",
+            "-crf", "23",
+            "-c:a", "copy"
+        ]
+        if threads:
+            cmd += ["-threads", str(threads)]
+        cmd.append(get_output_file(input_file, crop["name"]))
+    return cmd
+
+@tracing.traced
+def process_crops(input_file, crops):
+    """
+    Processes all crops of one input in a single ffmpeg run, so the source is decoded only once.
+    
+    Args:
+        input_file (str): Path to the input video file.
+        crops (list): Crop definitions containing 'x', 'y', 'width', 'height', and 'name'.
+        
+    Returns:
+        bool: True if every crop was processed successfully, False otherwise.
+    """
+    names = ", ".join(f"'{crop['name']}'" for crop in crops)
+    print(f"Processing crops {names} in a single pass")
     try:
-        subprocess.run(cmd, check=True)
-        print(f"Crop '{crop['name']}' created successfully at: {output_file}")
+        run_ffmpeg(build_crop_command(input_file, crops), probe.get_duration_or_none(input_file), desc="Cropping")
+        for crop in crops:
+            print(f"Crop '{crop['name']}' created successfully at: {get_output_file(input_file, crop['name'])}")
         return True
     except subprocess.CalledProcessError as e:
-        print(f"Error processing crop '{crop['name']}': {e}", file=sys.stderr)
+        error_lines = e.stderr.strip().splitlines()
+        print(f"Error processing crops {names}: {error_lines[-1] if error_lines else e}", file=sys.stderr)
         return False
 
+def process_crop(input_file, crop):
+    """
+    Processes a single crop by invoking ffmpeg with the appropriate crop filter.
+    
+    Args:
+        input_file (str): Path to the input video file.
+        crop (dict): Crop definition containing 'x', 'y', 'width', 'height', and 'name'.
+        
+    Returns:
+        bool: True if the crop was processed successfully, False otherwise.
+    """
+    return process_crops(input_file, [crop])
+
+def crop_threads(workers, outputs_per_job):
+    """
+    Splits the machine's cores between every x264 encode that runs at the same time.
+    
+    Args:
+        workers (int): Number of videos being cropped concurrently.
+        outputs_per_job (int): Number of crop outputs, and so x264 encoders, per video.
+        
+    Returns:
+        int: -threads value for each encoder.
+    """
+    return max(1, (os.cpu_count() or 1) // (workers * outputs_per_job))
+
+@tracing.traced
+def run_crop_jobs(jobs, workers=1, on_status=None, on_progress=None):
+    """
+    Crops several input videos at the same time, each one in a single ffmpeg pass.
+    
+    Args:
+        jobs (list): (input_file, crops) pairs, crops being already validated definitions.
+        workers (int): Number of videos processed concurrently.
+        on_status (callable): Called as on_status(job_index, status, message) when a job is
+                              'running', 'done' or 'failed'. It is called from worker threads.
+        on_progress (callable): Called as on_progress(job_index, progress) with the FFmpegProgress
+                                of a running job, also from worker threads.
+        
+    Returns:
+        list: True or False for every job, in job order.
+    """
+    workers = max(1, min(workers, len(jobs)))
+
+    def notify(index, status, message=""):
+        if on_status:
+            on_status(index, status, message)
+
+    def run_job(index, input_file, crops):
+        threads = crop_threads(workers, len(crops))
+        notify(index, "running", f"{len(crops)} crops, {threads} threads per encode")
+        try:
+            run_ffmpeg(build_crop_command(input_file, crops, threads), probe.get_duration_or_none(input_file),
+                       (lambda progress: on_progress(index, progress)) if on_progress else None)
+        except subprocess.CalledProcessError as e:
+            error_lines = e.stderr.strip().splitlines()
+            notify(index, "failed", error_lines[-1] if error_lines else str(e))
+            return False
+        notify(index, "done")
+        return True
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_job, i, input_file, crops) for i, (input_file, crops) in enumerate(jobs)]
+        return [future.result() for future in futures]
+
 def main():
     parser = argparse.ArgumentParser(
-        description="Crop a video into multiple parts based on specified crop definitions."
+        description="Crop one or more videos into multiple parts based on specified crop definitions."
     )
-    parser.add_argument("input_file", help="Path to the input video file")
+    parser.add_argument("input_files", nargs="+", help="Path(s) to the input video file(s)")
     parser.add_argument("--crop", action="append", required=True, 
                         help="Crop definition in the format name:x:y:width:height. Example: left:0:0:608:1080")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of videos to crop at the same time. Encoder threads are split between them")
+    parser.add_argument("--trace", metavar="TRACE_JSON",
+                        help="Record timing spans for every stage and ffmpeg run and save them in Chrome trace format")
     args = parser.parse_args()
 
-    input_file = args.input_file
-    if not os.path.isfile(input_file):
-        print(f"Error: The input file '{input_file}' does not exist or is not a file.", file=sys.stderr)
-        sys.exit(1)
-
-    # Retrieve input video dimensions.
-    video_width, video_height = get_video_dimensions(input_file)
-    print(f"Input video dimensions: {video_width}x{video_height}")
+    if args.trace:
+        tracing.enable()
+    try:
+        run(args)
+    finally:
+        if args.trace:
+            tracing.write_chrome_trace(args.trace)
 
+def run(args):
     crops = []
-    # Parse and validate each crop definition.
+    # Parse each crop definition.
     for crop_str in args.crop:
         try:
-            crop = parse_crop_option(crop_str)
+            crops.append(parse_crop_option(crop_str))
         except ValueError as e:
             print(f"Error: {e}", file=sys.stderr)
             sys.exit(1)
-        
-        # Check that crop offsets and sizes are within video bounds.
-        if crop["x"] < 0 or crop["y"] < 0:
-            print(f"Error: Crop '{crop['name']}' has negative x or y offset.", file=sys.stderr)
-            sys.exit(1)
-        if crop["width"] <= 0 or crop["height"] <= 0:
-            print(f"Error: Crop '{crop['name']}' must have positive width and height.", file=sys.stderr)
-            sys.exit(1)
-        if crop["x"] + crop["width"] > video_width:
-            print(f"Error: Crop '{crop['name']}' exceeds video width (x + width = {crop['x'] + crop['width']} > {video_width}).", file=sys.stderr)
-            sys.exit(1)
-        if crop["y"] + crop["height"] > video_height:
-            print(f"Error: Crop '{crop['name']}' exceeds video height (y + height = {crop['y'] + crop['height']} > {video_height}).", file=sys.stderr)
+
+    jobs = []
+    for input_file in args.input_files:
+        if not os.path.isfile(input_file):
+            print(f"Error: The input file '{input_file}' does not exist or is not a file.", file=sys.stderr)
             sys.exit(1)
-        crops.append(crop)
 
-    # Process each crop sequentially.
-    all_success = True
-    for crop in crops:
-        if not process_crop(input_file, crop):
-            all_success = False
+        # Retrieve input video dimensions.
+        video_width, video_height = get_video_dimensions(input_file)
+        print(f"Input video dimensions of '{input_file}': {video_width}x{video_height}")
+
+        for crop in crops:
+            # Check that crop offsets and sizes are within video bounds.
+            if crop["x"] < 0 or crop["y"] < 0:
+                print(f"Error: Crop '{crop['name']}' has negative x or y offset.", file=sys.stderr)
+                sys.exit(1)
+            if crop["width"] <= 0 or crop["height"] <= 0:
+                print(f"Error: Crop '{crop['name']}' must have positive width and height.", file=sys.stderr)
+                sys.exit(1)
+            if crop["x"] + crop["width"] > video_width:
+                print(f"Error: Crop '{crop['name']}' exceeds video width (x + width = {crop['x'] + crop['width']} > {video_width}).", file=sys.stderr)
+                sys.exit(1)
+            if crop["y"] + crop["height"] > video_height:
+                print(f"Error: Crop '{crop['name']}' exceeds video height (y + height = {crop['y'] + crop['height']} > {video_height}).", file=sys.stderr)
+                sys.exit(1)
+        jobs.append((input_file, crops))
+
+    if len(jobs) == 1:
+        # Process every crop from a single decode of the input.
+        all_success = process_crops(jobs[0][0], crops)
+    else:
+        # One progress bar per video, each in its own row
+        bars = [
+            tqdm(total=probe.get_duration_or_none(input_file) or 0, desc=os.path.basename(input_file), unit="s", position=i,
+                 bar_format="{l_bar}{bar}| {n:.0f}/{total:.0f}s [{elapsed}<{remaining}{postfix}]")
+            for i, (input_file, _) in enumerate(jobs)
+        ]
+        bar_callbacks = [tqdm_callback(bar) for bar in bars]
+
+        def print_status(index, status, message):
+            if status == "running":
+                return
+            bars[index].set_postfix_str(f"{status}{': ' + message if message else ''}")
+
+        def show_progress(index, progress):
+            if bars[index].total:
+                bar_callbacks[index](progress)
+
+        try:
+            all_success = all(run_crop_jobs(jobs, args.workers, print_status, show_progress))
+        finally:
+            for bar in bars:
+                bar.close()
 
     if not all_success:
         print("One or more crops failed.", file=sys.stderr)
@@ -10,54 +10,27 @@ via a table. Output files are saved in the same folder as the source video with
 
 import os
 import sys
-import subprocess
-import json
+import threading
 
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog, QListWidget,
-    QTableWidget, QTableWidgetItem, QTextEdit, QProgressBar, QLabel, QMessageBox
+    QTableWidget, QTableWidgetItem, QTextEdit, QProgressBar, QLabel, QMessageBox, QSpinBox
 )
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 
+import probe
+from video_cropper import get_output_file, run_crop_jobs
+
 # Helper methods (similar to command-line version)
 
 def get_video_dimensions(input_file):
     """
     Uses ffprobe to extract the video width and height
     """
-    cmd = [
-        "ffprobe",
-        "-v", "error",
-        "-print_format", "json",
-        "-show_entries", "stream=index,codec_type,width,height,rotation:stream_tags=rotate",
-        "-select_streams", "v:0",
-        input_file
-    ]
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        data = json.loads(result.stdout)
-        if "streams" not in data or not data["streams"]:
-            raise ValueError("No video stream found.")
-
-        # Extract primary width/height
-        stream_info = data["streams"][0]
-        width = stream_info.get("width", None)
-        height = stream_info.get("height", None)
-        if not (width and height):
-            raise ValueError("Could not determine video width/height.")
-
-        return width, height
+        return probe.get_video_dimensions(input_file)
     except Exception as e:
-        raise RuntimeError(f"Error retrieving video dimensions (considering rotation): {e}")
-
-def get_output_file(input_file, crop_name):
-    """
-    Constructs the output file path given the input file and crop name.
-    """
-    directory, filename = os.path.split(input_file)
-    base, _ = os.path.splitext(filename)
-    output_filename = f"{base}_{crop_name}.mp4"
-    return os.path.join(directory, output_filename)
+        raise RuntimeError(f"Error retrieving video dimensions: {e}")
 
 # Worker Thread for processing video crops
 
@@ -65,29 +38,38 @@ class VideoCropperWorker(QThread):
     logMessage = pyqtSignal(str)
     progressUpdate = pyqtSignal(int)
     errorOccurred = pyqtSignal(str)
+    jobStatus = pyqtSignal(int, str, str)  # video row, status, details
     
-    def __init__(self, input_videos, crop_definitions):
+    def __init__(self, input_videos, crop_definitions, workers=1):
         """
         input_videos: List of input video file paths.
         crop_definitions: List of dictionaries; each dict has keys:
                           'name', 'x', 'y', 'width', 'height' (all numeric values as needed).
+        workers: Number of videos cropped at the same time.
         """
         super().__init__()
         self.input_videos = input_videos
         self.crop_definitions = crop_definitions
+        self.workers = workers
 
     def run(self):
         total_tasks = len(self.input_videos) * len(self.crop_definitions)
         completed_tasks = 0
+        jobs = []
+        job_rows = []
 
-        for video in self.input_videos:
+        for row, video in enumerate(self.input_videos):
             try:
                 video_width, video_height = get_video_dimensions(video)
-                self.logMessage.emit(f"Processing video: {video} (Dimensions: {video_width}x{video_height})")
+                self.logMessage.emit(f"Checking video: {video} (Dimensions: {video_width}x{video_height})")
             except Exception as e:
                 self.errorOccurred.emit(str(e))
+                self.jobStatus.emit(row, "failed", str(e))
+                completed_tasks += len(self.crop_definitions)
+                self.progressUpdate.emit(int(100 * completed_tasks / total_tasks))
                 continue  # skip this video
 
+            valid_crops = []
             for crop in self.crop_definitions:
                 crop_name = crop['name']
                 # Validate crop bounds against video dimensions
@@ -115,28 +97,38 @@ class VideoCropperWorker(QThread):
                     completed_tasks += 1
                     self.progressUpdate.emit(int(100 * completed_tasks / total_tasks))
                     continue
-
-                output_file = get_output_file(video, crop_name)
-                crop_filter = f"crop={crop['width']}:{crop['height']}:{crop['x']}:{crop['y']}"
-                cmd = [
-                    "ffmpeg",
-                    "-i", video,
-                    "-filter:v", crop_filter,
-                    "-c:v", "libx264",
-                    "-preset", "fast",
-                    "-crf", "23",
-                    "-c:a", "copy",
-                    output_file,
-                    "-y"  # Overwrite if exists
-                ]
-                self.logMessage.emit(f"Running crop '{crop_name}' for video '{os.path.basename(video)}' with filter: {crop_filter}")
-                try:
-                    subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    self.logMessage.emit(f"Crop '{crop_name}' created successfully at: {output_file}")
-                except subprocess.CalledProcessError as e:
-                    self.errorOccurred.emit(f"Error processing crop '{crop_name}' for video '{video}': {e}")
-                completed_tasks += 1
+                valid_crops.append(crop)
+
+            if not valid_crops:
+                self.jobStatus.emit(row, "skipped", "No valid crops for this video")
+                continue
+            jobs.append((video, valid_crops))
+            job_rows.append(row)
+
+        # Videos run in parallel on the scheduler, each one cropped from a single decode
+        lock = threading.Lock()
+
+        def on_status(index, status, message):
+            nonlocal completed_tasks
+            video, crops = jobs[index]
+            self.jobStatus.emit(job_rows[index], status, message)
+            if status == "running":
+                self.logMessage.emit(f"Running crops for video '{os.path.basename(video)}' ({message})")
+                return
+            if status == "done":
+                for crop in crops:
+                    self.logMessage.emit(f"Crop '{crop['name']}' created successfully at: {get_output_file(video, crop['name'])}")
+            else:
+                self.errorOccurred.emit(f"Error processing crops for video '{video}': {message}")
+            with lock:
+                completed_tasks += len(crops)
                 self.progressUpdate.emit(int(100 * completed_tasks / total_tasks))
+
+        def on_progress(index, progress):
+            self.jobStatus.emit(job_rows[index], "running", progress.describe())
+
+        if jobs:
+            run_crop_jobs(jobs, self.workers, on_status, on_progress)
         self.logMessage.emit("Processing complete.")
 
 # Main GUI Application
@@ -194,11 +186,23 @@ class VideoCropperGUI(QWidget):
         self.runButton = QPushButton("Run")
         self.runButton.clicked.connect(self.runProcessing)
         ctrl_layout.addWidget(self.runButton)
+        ctrl_layout.addWidget(QLabel("Parallel videos:"))
+        self.workersSpinBox = QSpinBox()
+        self.workersSpinBox.setRange(1, max(1, os.cpu_count() or 1))
+        self.workersSpinBox.setValue(2)
+        ctrl_layout.addWidget(self.workersSpinBox)
         self.progressBar = QProgressBar()
         self.progressBar.setValue(0)
         ctrl_layout.addWidget(self.progressBar)
         main_layout.addLayout(ctrl_layout)
 
+        # Per-video job status
+        self.jobTable = QTableWidget(0, 3)
+        self.jobTable.setHorizontalHeaderLabels(["Video", "Status", "Details"])
+        self.jobTable.horizontalHeader().setStretchLastSection(True)
+        main_layout.addWidget(QLabel("Jobs:"))
+        main_layout.addWidget(self.jobTable)
+
         # Log / Output Section
         self.logTextEdit = QTextEdit()
         self.logTextEdit.setReadOnly(True)
@@ -290,6 +294,13 @@ class VideoCropperGUI(QWidget):
         """
         self.progressBar.setValue(value)
 
+    def updateJobStatus(self, row, status, details):
+        """
+        Shows the latest status of one video's crop job in the job table.
+        """
+        self.jobTable.setItem(row, 1, QTableWidgetItem(status))
+        self.jobTable.setItem(row, 2, QTableWidgetItem(details))
+
     def runProcessing(self):
         """
         Reads the selected videos and crop definitions and starts the processing worker thread.
@@ -342,9 +353,15 @@ class VideoCropperGUI(QWidget):
         self.progressBar.setValue(0)
         self.logTextEdit.clear()
         self.appendLog("Starting processing...")
+        self.jobTable.setRowCount(0)
+        for row, video in enumerate(input_videos):
+            self.jobTable.insertRow(row)
+            self.jobTable.setItem(row, 0, QTableWidgetItem(os.path.basename(video)))
+            self.jobTable.setItem(row, 1, QTableWidgetItem("queued"))
 
         # Instantiate and start the worker thread.
-        self.worker = VideoCropperWorker(input_videos, crop_definitions)
+        self.worker = VideoCropperWorker(input_videos, crop_definitions, self.workersSpinBox.value())
+        self.worker.jobStatus.connect(self.updateJobStatus)
         self.worker.logMessage.connect(self.appendLog)
         self.worker.progressUpdate.connect(self.updateProgress)
         self.worker.errorOccurred.connect(self.appendLog)
@@ -1,6 +1,14 @@
+import queue
 import subprocess
+import threading
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
+
+import probe
+from ffmpeg_runner import run_ffmpeg
+
+# Progress and results from the ffmpeg thread, drained on the Tk main loop
+events = queue.Queue()
 
 def select_input_file():
     """Prompt user to pick an input .mp4 file."""
@@ -35,19 +43,48 @@ def convert_volume():
         messagebox.showerror("Error", "Volume must be a valid number.")
         return
 
-    # Construct the ffmpeg command
+    # Construct the ffmpeg command; the save dialog has already confirmed any overwrite
     command = [
         "ffmpeg",
         "-i", input_file,
         "-filter:a", f"volume={volume_value}",
-        output_file
+        "-y", output_file
     ]
 
-    try:
-        subprocess.run(command, check=True)
-        messagebox.showinfo("Success", f"Output file created at:\n{output_file}")
-    except subprocess.CalledProcessError as e:
-        messagebox.showerror("Error", f"ffmpeg failed with error code {e.returncode}")
+    duration = probe.get_duration_or_none(input_file)  # without it the bar just stays empty
+
+    def run():
+        try:
+            run_ffmpeg(command, duration, lambda progress: events.put(("progress", progress)))
+            events.put(("done", output_file))
+        except subprocess.CalledProcessError as e:
+            events.put(("error", e))
+
+    convert_button.config(state="disabled")
+    progress_var.set(0)
+    threading.Thread(target=run, daemon=True).start()
+    root.after(100, poll_events)
+
+def poll_events():
+    """Apply progress from the ffmpeg thread to the window, since Tk may only be touched from here."""
+    while True:
+        try:
+            kind, value = events.get_nowait()
+        except queue.Empty:
+            root.after(100, poll_events)
+            return
+        if kind == "progress":
+            progress_var.set(100 * (value.fraction or 0))
+            status_var.set(value.describe())
+            continue
+        convert_button.config(state="normal")
+        if kind == "done":
+            progress_var.set(100)
+            messagebox.showinfo("Success", f"Output file created at:\n{value}")
+        else:
+            error_lines = value.stderr.strip().splitlines()
+            messagebox.showerror("Error", f"ffmpeg failed with error code {value.returncode}" + (f":\n{error_lines[-1]}" if error_lines else ""))
+        return
 
 # Create the Tkinter window
 root = tk.Tk()
@@ -57,6 +94,8 @@ root.title("Volume Adjuster for MP4")
 input_file_var = tk.StringVar()
 output_file_var = tk.StringVar()
 volume_var = tk.StringVar()
+progress_var = tk.DoubleVar()
+status_var = tk.StringVar()
 
 # GUI layout
 tk.Label(root, text="Input File:").grid(row=0, column=0, padx=10, pady=10, sticky="e")
@@ -70,6 +109,10 @@ tk.Button(root, text="Browse...", command=select_output_file).grid(row=1, column
 tk.Label(root, text="Volume Factor (e.g., 1.5):").grid(row=2, column=0, padx=10, pady=10, sticky="e")
 tk.Entry(root, textvariable=volume_var, width=10).grid(row=2, column=1, padx=10, pady=10, sticky="w")
 
-tk.Button(root, text="Convert", command=convert_volume).grid(row=3, column=0, columnspan=3, pady=20)
+convert_button = tk.Button(root, text="Convert", command=convert_volume)
+convert_button.grid(row=3, column=0, columnspan=3, pady=20)
+
+ttk.Progressbar(root, variable=progress_var, maximum=100).grid(row=4, column=0, columnspan=3, padx=10, sticky="ew")
+tk.Label(root, textvariable=status_var).grid(row=5, column=0, columnspan=3, pady=(0, 10))
 
 root.mainloop()
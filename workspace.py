@@ -0,0 +1,218 @@
+"""
+workspace.py
+
+Private scratch directories for jobs that write large intermediate files. Every job gets a
+unique directory under the scratch root, which defaults to the system temp directory and can be
+moved to a faster or bigger disk (a tmpfs, an NVMe scratch drive) with the AVES_SCRATCH_DIR
+environment variable or a tool's --work-dir option.
+
+A workspace checks free space before the job starts and records its owner's pid in a lock file.
+It is removed when the job finishes, at interpreter exit and on SIGTERM. Workspaces left behind
+by a process that was killed outright are swept the next time any workspace is created.
+
+A workspace created with a key is resumable: its directory name is derived from the key, so a
+rerun of the same job finds it again, and it survives failures until the job removes it itself.
+Resumable workspaces untouched for STALE_AGE are swept like abandoned ones.
+"""
+
+import atexit
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import time
+
+SCRATCH_ROOT = os.environ.get(
+    "AVES_SCRATCH_DIR",
+    os.path.join(tempfile.gettempdir(), "auto-video-editing-suite")
+)
+
+WORKSPACE_PREFIX = "job_"
+RESUMABLE_PREFIX = "resumable_"
+LOCK_FILE = "owner.lock"
+
+# Where the owner's pid can't be checked, workspaces this old are assumed to be abandoned
+STALE_AGE = 7 * 24 * 3600
+
+class InsufficientSpaceError(OSError):
+    """
+    Raised when the scratch disk has less free space than a job is expected to need.
+    """
+
+class WorkspaceBusyError(RuntimeError):
+    """
+    Raised when a resumable workspace is still in use by another running process.
+    """
+
+_active = set()
+_active_lock = threading.Lock()
+_handlers_installed = False
+
+def _pid_alive(pid):
+    if os.name == "nt":
+        return None  # os.kill would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by another user
+    return True
+
+def _is_stale(path):
+    try:
+        with open(os.path.join(path, LOCK_FILE), 'r') as f:
+            host, pid = f.read().split()
+        pid = int(pid)
+    except (OSError, ValueError):
+        # No readable lock yet: either still being created or left half made, judge by age
+        return time.time() - os.path.getmtime(path) > STALE_AGE
+    if host != socket.gethostname():
+        return False  # a shared scratch disk, the owner lives on another machine
+    alive = _pid_alive(pid)
+    if alive is None:
+        return time.time() - os.path.getmtime(path) > STALE_AGE
+    return not alive
+
+def _owner_alive(path):
+    try:
+        with open(os.path.join(path, LOCK_FILE), 'r') as f:
+            host, pid = f.read().split()
+        pid = int(pid)
+    except (OSError, ValueError):
+        return False
+    if pid == os.getpid():
+        return False
+    return host != socket.gethostname() or _pid_alive(pid) is not False
+
+def sweep_stale_workspaces(root=None):
+    """
+    Deletes workspaces under root whose owning process no longer exists, and resumable
+    workspaces nobody has touched for STALE_AGE.
+
+    Returns:
+        int: Number of workspaces removed.
+    """
+    root = root or SCRATCH_ROOT
+    removed = 0
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if not entry.is_dir():
+            continue
+        try:
+            if entry.name.startswith(WORKSPACE_PREFIX):
+                stale = _is_stale(entry.path)
+            elif entry.name.startswith(RESUMABLE_PREFIX):
+                stale = time.time() - os.path.getmtime(entry.path) > STALE_AGE and not _owner_alive(entry.path)
+            else:
+                continue
+            if stale:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        except OSError:
+            pass  # removed by another sweep in the meantime
+    return removed
+
+def check_free_space(root, required_bytes):
+    """
+    Raises InsufficientSpaceError if the disk holding root has less than required_bytes free.
+    """
+    free = shutil.disk_usage(root).free
+    if free < required_bytes:
+        raise InsufficientSpaceError(
+            f"Scratch directory {root} has {free / 1024 ** 3:.1f} GB free, "
+            f"but this job needs about {required_bytes / 1024 ** 3:.1f} GB. "
+            f"Free some space or point --work-dir / AVES_SCRATCH_DIR at a bigger disk."
+        )
+
+def _cleanup_all():
+    with _active_lock:
+        workspaces = list(_active)
+    for workspace in workspaces:
+        workspace.cleanup()
+
+def _on_sigterm(signum, frame):
+    # Turn the signal into a normal exit so finally blocks and atexit handlers run
+    raise SystemExit(128 + signum)
+
+def _install_handlers():
+    global _handlers_installed
+    if _handlers_installed:
+        return
+    _handlers_installed = True
+    atexit.register(_cleanup_all)
+    # Signal handlers can only be set from the main thread, and an existing handler is left alone
+    if threading.current_thread() is threading.main_thread():
+        for name in ("SIGTERM", "SIGHUP"):
+            signum = getattr(signal, name, None)
+            if signum is not None and signal.getsignal(signum) is signal.SIG_DFL:
+                signal.signal(signum, _on_sigterm)
+
+class Workspace:
+    def __init__(self, job_name, root=None, required_bytes=0, key=None):
+        """
+        job_name: Short name included in the directory name, e.g. 'silence_remover'.
+        root: Directory to create the workspace in, defaults to SCRATCH_ROOT.
+        required_bytes: Predicted size of the intermediate files, checked against free space.
+        key: Makes the workspace resumable. The same key always maps to the same directory,
+             and only an explicit cleanup() removes it.
+        """
+        self.job_name = job_name
+        self.root = root or SCRATCH_ROOT
+        self.required_bytes = required_bytes
+        self.key = key
+        self.path = None
+        self.owner_pid = None
+
+    def create(self):
+        """
+        Creates the workspace directory and returns its path.
+
+        Raises:
+            InsufficientSpaceError: If the scratch disk can't hold required_bytes.
+            WorkspaceBusyError: If a resumable workspace is in use by another process.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        _install_handlers()
+        sweep_stale_workspaces(self.root)
+        check_free_space(self.root, self.required_bytes)
+
+        if self.key:
+            path = os.path.join(self.root, f"{RESUMABLE_PREFIX}{self.job_name}_{self.key}")
+            if os.path.isdir(path) and _owner_alive(path):
+                raise WorkspaceBusyError(f"Workspace {path} is in use by another running job")
+            os.makedirs(path, exist_ok=True)
+            os.utime(path)
+            self.path = path
+        else:
+            self.path = tempfile.mkdtemp(prefix=f"{WORKSPACE_PREFIX}{self.job_name}_", dir=self.root)
+        self.owner_pid = os.getpid()
+        with open(os.path.join(self.path, LOCK_FILE), 'w') as f:
+            f.write(f"{socket.gethostname()} {self.owner_pid}\n")
+        # Resumable workspaces outlive a failed or interrupted run, so exit handlers leave them alone
+        if not self.key:
+            with _active_lock:
+                _active.add(self)
+        return self.path
+
+    def cleanup(self):
+        """
+        Removes the workspace and everything in it. Safe to call more than once.
+        """
+        with _active_lock:
+            _active.discard(self)
+        # Forked worker processes inherit this object, only the process that made it may delete it
+        if self.path and os.getpid() == self.owner_pid:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path = None
+
+    def __enter__(self):
+        return self.create()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()